@@ -1,5 +1,13 @@
 import sqlite3
 import os
+import base64
+import hashlib
+import json
+import re
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from werkzeug.security import generate_password_hash, check_password_hash
 from cryptography.fernet import Fernet
 
@@ -9,14 +17,340 @@ DATA_DIR = os.environ.get("DATA_DIR", "./data")
 os.makedirs(DATA_DIR, exist_ok=True, mode=0o775)
 DB_PATH = os.path.join(DATA_DIR, "data.db")
 
+# 连接池配置（可通过环境变量调整）
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "8192"))
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+
+
+class ProcessLocal:
+    """按进程隔离的状态（后台线程、连接、socket、线程池）
+
+    fork（如 gunicorn --preload）之后后台线程不会被继承，父进程的连接和 socket 也不能在子进程中复用，
+    因此子进程第一次使用时会重新调用 _reset_state() 重建全部状态。
+    子类在 _reset_state() 中创建状态，使用前调用 _ensure_process()；
+    需要后台线程的子类设置 thread_name 并实现 _run()，使用前调用 _ensure_started()。
+    """
+
+    thread_name = None
+
+    def __init__(self):
+        self._process_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._thread = None
+        self._reset_state()
+        self._pid = os.getpid()
+
+    def _reset_state(self):
+        raise NotImplementedError
+
+    def _ensure_process(self):
+        if self._pid != os.getpid():
+            with self._process_lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._process_lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class PooledConnection(sqlite3.Connection):
+    """连接池中的连接：close() 时归还连接池而不是真正关闭"""
+
+    def close(self):
+        _pool.release(self)
+
+    def really_close(self):
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool(ProcessLocal):
+    """有界 SQLite 连接池，兼容 gunicorn gthread 多线程 worker
+
+    每个连接只在创建时执行一次 PRAGMA 调优，之后在请求之间复用。
+    空闲连接数量超过 size 时多余的连接会被真正关闭。
+    """
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        super().__init__()
+
+    def _reset_state(self):
+        # 后进先出，优先复用最近使用过的（缓存仍然是热的）连接
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            DB_PATH,
+            check_same_thread=False,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        # 启用 UTF-8 支持
+        conn.execute('PRAGMA encoding = "UTF-8"')
+        try:
+            # 部分文件系统（如网络挂载）不支持 WAL，失败时保持默认日志模式
+            conn.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.Error as e:
+            print(f"[WARNING] Failed to enable WAL mode: {e}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn._in_pool = False
+        return conn
+
+    def acquire(self):
+        self._ensure_process()
+        self._local.count = getattr(self._local, "count", 0) + 1
+        try:
+            conn = self._idle.get_nowait()
+            conn._in_pool = False
+            with self._lock:
+                self.reused += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        conn = self._open()
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def release(self, conn):
+        if getattr(conn, "_in_pool", False):
+            return
+        try:
+            # 未提交的事务不能带回连接池
+            if conn.in_transaction:
+                conn.rollback()
+            conn._in_pool = True
+            self._idle.put_nowait(conn)
+            return
+        except (queue.Full, sqlite3.Error):
+            pass
+        conn._in_pool = True
+        with self._lock:
+            self.discarded += 1
+        try:
+            conn.really_close()
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        """关闭所有空闲连接（数据库文件被替换时调用）"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.really_close()
+            except sqlite3.Error:
+                pass
+
+    def begin_request(self):
+        """重置当前线程的连接计数（每个请求开始时调用）"""
+        self._local.count = 0
+
+    def request_count(self):
+        """当前线程自上次 begin_request 以来获取连接的次数"""
+        return getattr(self._local, "count", 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
+
+
+_pool = ConnectionPool(DB_POOL_SIZE)
+
 
 def get_conn():
-    """获取数据库连接 - 必须在 ENCRYPTION_KEY 初始化之前定义"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    # 启用 UTF-8 支持
-    conn.execute('PRAGMA encoding = "UTF-8"')
-    return conn
+    """从连接池获取数据库连接 - 必须在 ENCRYPTION_KEY 初始化之前定义
+
+    调用方仍然使用 conn.close()，连接会被归还到连接池。
+    """
+    return _pool.acquire()
+
+
+def reset_pool():
+    """关闭连接池中的空闲连接，下次获取时重新打开数据库文件"""
+    _pool.clear()
+    _config_cache.clear()
+
+
+def begin_request_conn_count():
+    _pool.begin_request()
+
+
+def get_request_conn_count():
+    return _pool.request_count()
+
+
+def get_pool_stats():
+    return _pool.stats()
+
+
+# ---------------- Single-writer commit queue ----------------
+DB_WRITE_BATCH_SIZE = int(os.environ.get("DB_WRITE_BATCH_SIZE", "64"))
+DB_WRITE_MAX_WAIT_MS = float(os.environ.get("DB_WRITE_MAX_WAIT_MS", "2"))
+DB_WRITE_TIMEOUT = float(os.environ.get("DB_WRITE_TIMEOUT", "30"))
+
+
+class WriteQueue(ProcessLocal):
+    """单写线程提交队列
+
+    写操作以 fn(conn) 的形式入队，由专用写线程执行。同一时间排队的多个小写操作
+    合并到一个事务中提交（每个操作使用独立的 SAVEPOINT，互不影响），
+    调用方通过 Future 拿到各自的返回值（如 lastrowid）或异常。
+    """
+
+    thread_name = "db-writer"
+
+    def __init__(self, batch_size, max_wait_ms):
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def _reset_state(self):
+        self._queue = queue.Queue()
+        self._conn = None
+        self.jobs = 0
+        self.failed = 0
+        self.commits = 0
+        self.commit_time_total = 0.0
+        self.commit_time_max = 0.0
+
+    def submit(self, fn):
+        """入队一个写操作，返回 Future"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn, timeout=None):
+        """入队并等待写操作完成，返回 fn 的返回值"""
+        # 写线程内部的嵌套写操作直接执行，避免自己等待自己
+        if threading.current_thread() is self._thread:
+            return fn(self._conn)
+        return self.submit(fn).result(timeout if timeout is not None else DB_WRITE_TIMEOUT)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            batch = [(fn, fut) for fn, fut in batch if fut.set_running_or_notify_cancel()]
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        results = []
+        started = time.monotonic()
+        try:
+            if self._conn is None:
+                self._conn = _pool._open()
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, _ in batch:
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    results.append((True, fn(conn)))
+                    conn.execute("RELEASE write_job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    results.append((False, e))
+            conn.commit()
+        except Exception as e:
+            # 事务整体失败（如 database is locked），所有调用方都收到该异常
+            try:
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+            except sqlite3.Error:
+                self._conn = None
+            results = [(False, e)] * len(batch)
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.jobs += len(batch)
+            self.failed += sum(1 for ok, _ in results if not ok)
+            self.commits += 1
+            self.commit_time_total += elapsed
+            self.commit_time_max = max(self.commit_time_max, elapsed)
+
+        for (_, fut), (ok, value) in zip(batch, results):
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "jobs": self.jobs,
+                "failed": self.failed,
+                "commits": self.commits,
+                "avg_batch_size": round(self.jobs / self.commits, 2) if self.commits else 0,
+                "avg_commit_ms": round(self.commit_time_total / self.commits * 1000, 3) if self.commits else 0,
+                "max_commit_ms": round(self.commit_time_max * 1000, 3),
+            }
+
+
+_writer = WriteQueue(DB_WRITE_BATCH_SIZE, DB_WRITE_MAX_WAIT_MS)
+
+
+def run_write(fn, timeout=None):
+    """通过单写线程执行写操作 fn(conn)，与其他并发写操作合并提交"""
+    return _writer.run(fn, timeout)
+
+
+def submit_write(fn):
+    """异步提交写操作 fn(conn)，不等待完成，返回 Future"""
+    return _writer.submit(fn)
+
+
+def get_writer_stats():
+    return _writer.stats()
 
 
 # 加密密钥 - 生产环境应使用环境变量
@@ -96,9 +430,12 @@ def decrypt_password(encrypted_password):
         return encrypted_password
 
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+# ---------------- Schema migrations ----------------
+# 每个迁移步骤只执行一次，执行后记录到 schema_version 表。
+# 新的表结构变更请追加到 MIGRATIONS 末尾，不要修改已发布的步骤。
+
+def _migrate_base_schema(cur):
+    """基础表结构（兼容引入版本号之前的老数据库，所有语句均可重复执行）"""
     cur.execute(
         """CREATE TABLE IF NOT EXISTS users (
            id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -210,9 +547,220 @@ def init_db():
                VALUES (?, ?, ?, ?, ?, ?)""",
             ("默认源", "https://api.qhsou.com/api/one.php", None, "sequential", 1, 0)
         )
-    
-    conn.commit()
-    conn.close()
+
+
+def _migrate_uploaded_content_hash(cur):
+    """上传文章内容哈希列及唯一索引（用于去重）"""
+    cur.execute("PRAGMA table_info(uploaded_articles)")
+    article_columns = [col[1] for col in cur.fetchall()]
+    if 'content_hash' not in article_columns:
+        cur.execute("ALTER TABLE uploaded_articles ADD COLUMN content_hash TEXT")
+    backfill_uploaded_content_hash(cur.connection)
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_uploaded_articles_content_hash ON uploaded_articles(content_hash)"
+    )
+
+
+def _migrate_lookup_indexes(cur):
+    """常用查询的二级索引"""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_favorites_user_id ON favorites(user_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_password_resets_email_code ON password_resets(email, code)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_verifications_email_code_type ON email_verifications(email, code, type)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_uploaded_articles_user_id ON uploaded_articles(user_id)")
+
+
+def _migrate_uploaded_listing_index(cur):
+    """上传文章按用户分页列表的索引（keyset 分页：date_added, id）"""
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uploaded_articles_user_date ON uploaded_articles(user_id, date_added, id)"
+    )
+
+
+def _migrate_favorites_listing_index(cur):
+    """收藏按用户分页列表的索引（keyset 分页：date_added, id）"""
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_favorites_user_date ON favorites(user_id, date_added, id)"
+    )
+
+
+def _migrate_source_prefetch_settings(cur):
+    """文章源预取配置（NULL 表示使用全局默认值）"""
+    cur.execute("PRAGMA table_info(article_sources)")
+    columns = [col[1] for col in cur.fetchall()]
+    if 'prefetch_size' not in columns:
+        cur.execute("ALTER TABLE article_sources ADD COLUMN prefetch_size INTEGER")
+    if 'prefetch_interval' not in columns:
+        cur.execute("ALTER TABLE article_sources ADD COLUMN prefetch_interval REAL")
+
+
+def _migrate_fetched_articles(cur):
+    """从文章源获取过的文章存档（按 源 + 内容哈希 去重），用于所有源失败时的兜底"""
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS fetched_articles (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           source_id INTEGER NOT NULL,
+           content_hash TEXT NOT NULL,
+           upstream_id TEXT,
+           title TEXT,
+           author TEXT,
+           content TEXT,
+           source_name TEXT,
+           fetched_at REAL NOT NULL,
+           last_served_at REAL NOT NULL DEFAULT 0,
+           UNIQUE(source_id, content_hash)
+        )"""
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_fetched_articles_fetched_at ON fetched_articles(fetched_at)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fetched_articles_served ON fetched_articles(last_served_at, fetched_at)"
+    )
+
+
+def _migrate_daily_articles(cur):
+    """每天固定的共享"每日一文"（day 为配置时区下的日期）"""
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS daily_articles (
+           day TEXT PRIMARY KEY,
+           article_id TEXT,
+           title TEXT,
+           author TEXT,
+           content TEXT,
+           source TEXT,
+           pinned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )"""
+    )
+
+
+def _migrate_source_max_response_bytes(cur):
+    """文章源响应体大小上限（NULL 表示使用全局默认值）"""
+    cur.execute("PRAGMA table_info(article_sources)")
+    columns = [col[1] for col in cur.fetchall()]
+    if 'max_response_bytes' not in columns:
+        cur.execute("ALTER TABLE article_sources ADD COLUMN max_response_bytes INTEGER")
+
+
+def _migrate_email_jobs(cur):
+    """待发送邮件队列（由后台发送线程处理）"""
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS email_jobs (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           to_email TEXT NOT NULL,
+           subject TEXT NOT NULL,
+           html_body TEXT NOT NULL,
+           status TEXT NOT NULL DEFAULT 'pending',
+           attempts INTEGER NOT NULL DEFAULT 0,
+           next_attempt_at REAL NOT NULL,
+           last_error TEXT,
+           created_at REAL NOT NULL,
+           sent_at REAL
+        )"""
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_jobs_status_next ON email_jobs(status, next_attempt_at)")
+
+
+def _migrate_uploaded_hash_per_user(cur):
+    """上传文章改为按用户去重：(user_id, content_hash) 唯一，不同用户可以上传相同的文章"""
+    cur.execute("DROP INDEX IF EXISTS idx_uploaded_articles_content_hash")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_uploaded_articles_user_hash ON uploaded_articles(user_id, content_hash)"
+    )
+    # 原先因跨用户重复而未获得哈希的文章，按用户重新补齐
+    backfill_uploaded_content_hash(cur.connection, per_user=True)
+
+
+def _migrate_email_jobs_claimed_at(cur):
+    """邮件任务被取出（进入 sending 状态）的时间，用于判断发送是否超时"""
+    cur.execute("PRAGMA table_info(email_jobs)")
+    columns = [col[1] for col in cur.fetchall()]
+    if 'claimed_at' not in columns:
+        cur.execute("ALTER TABLE email_jobs ADD COLUMN claimed_at REAL")
+
+
+def _migrate_email_jobs_claimed_index(cur):
+    """按 claimed_at 查询最近一次取出任务的时间（全局发送限速）"""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_jobs_claimed_at ON email_jobs(claimed_at)")
+
+
+def _migrate_config_version(cur):
+    """system_config 版本计数器，任何写入都由触发器递增，供各进程判断配置缓存是否过期"""
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS config_version (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           version INTEGER NOT NULL DEFAULT 0
+        )"""
+    )
+    cur.execute("INSERT OR IGNORE INTO config_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS trg_system_config_{event.lower()}
+               AFTER {event} ON system_config
+               BEGIN
+                   UPDATE config_version SET version = version + 1 WHERE id = 1;
+               END"""
+        )
+
+
+MIGRATIONS = [
+    (1, "base schema", _migrate_base_schema),
+    (2, "uploaded_articles content_hash", _migrate_uploaded_content_hash),
+    (3, "lookup indexes", _migrate_lookup_indexes),
+    (4, "uploaded_articles listing index", _migrate_uploaded_listing_index),
+    (5, "favorites listing index", _migrate_favorites_listing_index),
+    (6, "article_sources prefetch settings", _migrate_source_prefetch_settings),
+    (7, "fetched_articles archive", _migrate_fetched_articles),
+    (8, "daily_articles", _migrate_daily_articles),
+    (9, "article_sources max_response_bytes", _migrate_source_max_response_bytes),
+    (10, "email_jobs", _migrate_email_jobs),
+    (11, "system_config version counter", _migrate_config_version),
+    (12, "uploaded_articles per-user content_hash", _migrate_uploaded_hash_per_user),
+    (13, "email_jobs claimed_at", _migrate_email_jobs_claimed_at),
+    (14, "email_jobs claimed_at index", _migrate_email_jobs_claimed_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """读取当前数据库的表结构版本，未记录过版本的数据库返回 0"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def init_db():
+    """按顺序执行尚未应用的迁移步骤；表结构已是最新时不执行任何 DDL"""
+    conn = get_conn()
+    try:
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return
+
+        cur = conn.cursor()
+        # 多个 worker 同时启动时，只有拿到写锁的进程执行迁移，其余进程等待后重新检查版本
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            """CREATE TABLE IF NOT EXISTS schema_version (
+               version INTEGER PRIMARY KEY,
+               description TEXT,
+               applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        current = get_schema_version(conn)
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(cur)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description),
+            )
+            print(f"[INFO] Applied schema migration {version}: {description}")
+        conn.commit()
+    finally:
+        conn.close()
 
 
 def get_user_by_username(username):
@@ -247,23 +795,31 @@ def verify_user(username, password):
 
 
 def add_favorite(user_id, article):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """INSERT INTO favorites (user_id, title, author, content, article_id)
-                   VALUES (?, ?, ?, ?, ?)""",
-        (
-            user_id,
-            article.get("title"),
-            article.get("author"),
-            article.get("content"),
-            article.get("id"),
-        ),
+    params = (
+        user_id,
+        article.get("title"),
+        article.get("author"),
+        article.get("content"),
+        article.get("id"),
     )
-    conn.commit()
-    fid = cur.lastrowid
-    conn.close()
-    return fid
+
+    def _write(conn):
+        # 同一篇文章（相同的 article_id 和标题）重复收藏时返回已有的收藏
+        if params[4] is not None:
+            row = conn.execute(
+                "SELECT id FROM favorites WHERE user_id = ? AND article_id = ? AND title IS ? LIMIT 1",
+                (user_id, str(params[4]), params[1]),
+            ).fetchone()
+            if row:
+                return row[0]
+        cur = conn.execute(
+            """INSERT INTO favorites (user_id, title, author, content, article_id)
+                       VALUES (?, ?, ?, ?, ?)""",
+            params,
+        )
+        return cur.lastrowid
+
+    return run_write(_write)
 
 
 def get_favorites(user_id):
@@ -275,6 +831,72 @@ def get_favorites(user_id):
     return [dict(r) for r in rows]
 
 
+def get_favorites_page(user_id, limit=20, cursor=None):
+    """按 (date_added, id) 倒序分页获取收藏，只返回列表所需字段和摘要"""
+    params = [user_id]
+    where = "user_id = ?"
+    if cursor:
+        where += " AND (date_added, id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    params.append(limit + 1)
+
+    conn = get_conn()
+    rows = conn.execute(
+        f"""SELECT id, title, author, article_id, date_added,
+                   substr(content, 1, {EXCERPT_LENGTH * 4}) AS excerpt
+            FROM favorites
+            WHERE {where}
+            ORDER BY date_added DESC, id DESC
+            LIMIT ?""",
+        params,
+    ).fetchall()
+    conn.close()
+
+    items, next_cursor = _keyset_page(rows, limit)
+    for item in items:
+        item["excerpt"] = make_excerpt(item["excerpt"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_favorite_by_id(user_id, fav_id):
+    """获取用户的单条收藏（包含完整内容）"""
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT * FROM favorites WHERE id = ? AND user_id = ?", (fav_id, user_id)
+    ).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def iter_favorites_for_export(user_id, fav_ids=None):
+    """逐行读取用户收藏（用于导出），fav_ids 为 None 时导出全部
+
+    使用游标逐行返回，不会一次性把所有正文加载到内存。
+    """
+    conn = get_conn()
+    try:
+        if fav_ids is None:
+            yield from conn.execute(
+                """SELECT id, title, author, content FROM favorites
+                   WHERE user_id = ? ORDER BY date_added DESC, id DESC""",
+                (user_id,),
+            )
+            return
+        fav_ids = list(fav_ids)
+        # 分块查询，避免超过 SQLite 变量个数上限
+        for i in range(0, len(fav_ids), 500):
+            chunk = fav_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            yield from conn.execute(
+                f"""SELECT id, title, author, content FROM favorites
+                    WHERE user_id = ? AND id IN ({placeholders})
+                    ORDER BY date_added DESC, id DESC""",
+                [user_id, *chunk],
+            )
+    finally:
+        conn.close()
+
+
 def remove_favorite(user_id, fav_id):
     conn = get_conn()
     conn.execute(
@@ -358,8 +980,51 @@ def delete_user(user_id):
 
 
 # 上传文章相关函数
-def save_uploaded_article(title, author, content, file_name="", file_size=0, user_id=None):
-    """保存上传的文章（确保 UTF-8 编码）"""
+def compute_content_hash(title, content):
+    """计算上传文章的内容哈希（标题 + 正文，统一换行并去除首尾空白后做 SHA-256）"""
+    def _normalize(text):
+        return (text or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+
+    data = _normalize(title) + "\x00" + _normalize(content)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def backfill_uploaded_content_hash(conn, batch_size=500, per_user=False):
+    """为历史文章补齐 content_hash，按 id 分批处理以控制内存
+
+    已存在的重复文章只有最早的一篇会获得哈希，其余保持 NULL，以便创建唯一索引。
+    per_user=True 时只在同一用户的文章之间判断重复。
+    """
+    seen = {
+        (row[0] if per_user else None, row[1]) for row in conn.execute(
+            "SELECT user_id, content_hash FROM uploaded_articles WHERE content_hash IS NOT NULL"
+        )
+    }
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            """SELECT id, title, content, user_id FROM uploaded_articles
+               WHERE content_hash IS NULL AND id > ? ORDER BY id LIMIT ?""",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            content_hash = compute_content_hash(row[1], row[2])
+            key = (row[3] if per_user else None, content_hash)
+            if key not in seen:
+                seen.add(key)
+                updates.append((content_hash, row[0]))
+        conn.executemany("UPDATE uploaded_articles SET content_hash = ? WHERE id = ?", updates)
+        last_id = rows[-1][0]
+
+
+def insert_uploaded_article(title, author, content, file_name="", file_size=0, user_id=None):
+    """保存上传的文章，在同一用户的文章中按 content_hash 去重，返回 (article_id, created)
+
+    该用户已有相同内容的文章时不会重复插入，返回已有文章的 id 与 created=False。
+    """
     if isinstance(title, str):
         title = title.encode("utf-8").decode("utf-8")
     if isinstance(author, str):
@@ -368,17 +1033,94 @@ def save_uploaded_article(title, author, content, file_name="", file_size=0, use
         content = content.encode("utf-8").decode("utf-8")
     if isinstance(file_name, str):
         file_name = file_name.encode("utf-8").decode("utf-8")
+    content_hash = compute_content_hash(title, content)
 
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """INSERT INTO uploaded_articles (user_id, title, author, content, file_name, file_size)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-        (user_id, title, author, content, file_name, file_size),
-    )
-    conn.commit()
-    article_id = cur.lastrowid
-    conn.close()
+    def _write(conn):
+        # 写操作由单写线程串行执行，先查后插不会产生竞争；
+        # 先查询也覆盖了 user_id 为 NULL 时唯一索引不生效的情况
+        row = conn.execute(
+            "SELECT id FROM uploaded_articles WHERE user_id IS ? AND content_hash = ?",
+            (user_id, content_hash),
+        ).fetchone()
+        if row:
+            return row[0], False
+        cur = conn.execute(
+            """INSERT INTO uploaded_articles (user_id, title, author, content, file_name, file_size, content_hash)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(user_id, content_hash) DO NOTHING""",
+            (user_id, title, author, content, file_name, file_size, content_hash),
+        )
+        return cur.lastrowid, True
+
+    return run_write(_write)
+
+
+def insert_uploaded_articles_batch(articles, user_id=None):
+    """批量保存上传的文章（单个事务，executemany 插入），返回与输入顺序一致的 [(article_id, created)]
+
+    articles 为 dict 列表，包含 title / author / content / file_name / file_size。
+    批次内部以及与该用户已有文章之间都按 content_hash 去重。
+    """
+    items = []
+    for article in articles:
+        title = article.get("title")
+        content = article.get("content")
+        items.append((
+            user_id,
+            title,
+            article.get("author"),
+            content,
+            article.get("file_name") or "",
+            article.get("file_size") or 0,
+            compute_content_hash(title, content),
+        ))
+    hashes = list({item[-1] for item in items})
+
+    def _lookup_ids(conn, keys):
+        found = {}
+        # 分块查询，避免超过 SQLite 变量个数上限
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"""SELECT id, content_hash FROM uploaded_articles
+                    WHERE user_id IS ? AND content_hash IN ({placeholders})""",
+                [user_id] + chunk,
+            ):
+                found[row[1]] = row[0]
+        return found
+
+    def _write(conn):
+        existing = _lookup_ids(conn, hashes)
+        pending = {}
+        for item in items:
+            if item[-1] not in existing and item[-1] not in pending:
+                pending[item[-1]] = item
+        conn.executemany(
+            """INSERT INTO uploaded_articles (user_id, title, author, content, file_name, file_size, content_hash)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(user_id, content_hash) DO NOTHING""",
+            list(pending.values()),
+        )
+        inserted = _lookup_ids(conn, list(pending))
+
+        results = []
+        for item in items:
+            content_hash = item[-1]
+            if content_hash in pending:
+                # 批次内重复的文章只有第一篇算作新建
+                results.append((inserted.get(content_hash), True))
+                del pending[content_hash]
+            else:
+                results.append((existing.get(content_hash) or inserted.get(content_hash), False))
+        return results
+
+    return run_write(_write)
+
+
+def save_uploaded_article(title, author, content, file_name="", file_size=0, user_id=None):
+    """保存上传的文章（确保 UTF-8 编码），返回文章 id（内容重复时返回已有文章的 id）"""
+    article_id, _ = insert_uploaded_article(title, author, content, file_name, file_size, user_id)
     return article_id
 
 
@@ -392,6 +1134,74 @@ def get_uploaded_article_by_id(article_id):
     return dict(row) if row else None
 
 
+# ---------------- Keyset pagination helpers ----------------
+EXCERPT_LENGTH = 120
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def encode_cursor(date_added, row_id):
+    """把最后一行的 (date_added, id) 编码为不透明的分页游标"""
+    raw = json.dumps([date_added, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """解析分页游标，格式不正确时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_added, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(date_added, str) or not isinstance(row_id, int):
+        raise ValueError("invalid cursor")
+    return date_added, row_id
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """去掉 HTML 标签并截取正文开头作为摘要"""
+    if not text:
+        return ""
+    plain = " ".join(_TAG_RE.sub(" ", text).split())
+    return plain if len(plain) <= length else plain[:length] + "…"
+
+
+def _keyset_page(rows, limit):
+    """把多取一行的查询结果拆分为 (items, next_cursor)"""
+    items = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["date_added"], last["id"])
+    return items, next_cursor
+
+
+def get_uploaded_articles_page(user_id, limit=20, cursor=None):
+    """按 (date_added, id) 倒序分页获取用户上传的文章，只返回列表所需字段和摘要"""
+    params = [user_id]
+    where = "user_id = ?"
+    if cursor:
+        where += " AND (date_added, id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    params.append(limit + 1)
+
+    conn = get_conn()
+    rows = conn.execute(
+        f"""SELECT id, title, author, file_name, file_size, date_added,
+                   substr(content, 1, {EXCERPT_LENGTH * 4}) AS excerpt
+            FROM uploaded_articles
+            WHERE {where}
+            ORDER BY date_added DESC, id DESC
+            LIMIT ?""",
+        params,
+    ).fetchall()
+    conn.close()
+
+    items, next_cursor = _keyset_page(rows, limit)
+    for item in items:
+        item["excerpt"] = make_excerpt(item["excerpt"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
 def get_uploaded_articles():
     """获取所有上传的文章"""
     conn = get_conn()
@@ -427,42 +1237,163 @@ def delete_all_uploaded_articles():
     return count
 
 
+# system_config 缓存的版本检查间隔（秒）。本进程内的写入会立即失效缓存，
+# 其他 worker 的写入最多在该间隔后被发现；设为 0 表示每次读取都检查版本
+CONFIG_CACHE_CHECK_INTERVAL = float(os.environ.get("CONFIG_CACHE_CHECK_INTERVAL", "1"))
+
+SMTP_CONFIG_KEYS = (
+    'smtp_server', 'smtp_port', 'smtp_username', 'smtp_password',
+    'smtp_from_name', 'smtp_from_email', 'smtp_use_ssl', 'smtp_use_tls', 'smtp_enabled'
+)
+
+
+class ConfigCache:
+    """system_config 的进程内只读视图
+
+    整张表一次性加载到内存，通过 config_version 计数器（由触发器在每次写入时递增）
+    判断是否需要重新加载，因此多个 gunicorn worker 之间也能保持一致。
+    解密后的 SMTP 密码等派生值按版本缓存，配置不变时不会重复解密。
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self.clear()
+        self.hits = 0
+        self.reloads = 0
+        self.version_checks = 0
+
+    def clear(self):
+        """丢弃缓存内容，下次读取时重新加载"""
+        self._values = None
+        self._version = None
+        self._derived = {}
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        """本进程写入配置后调用：下次读取时立即检查版本"""
+        self._checked_at = 0.0
+
+    def _load(self):
+        """检查版本号，必要时重新加载整张配置表（调用方需持有锁）"""
+        conn = get_conn()
+        try:
+            self.version_checks += 1
+            try:
+                row = conn.execute("SELECT version FROM config_version WHERE id = 1").fetchone()
+                version = row["version"] if row else 0
+            except sqlite3.OperationalError:
+                # 尚未执行迁移 11 的数据库没有版本表，每次都重新加载
+                version = None
+            if self._values is not None and version is not None and version == self._version:
+                return
+            rows = conn.execute("SELECT config_key, config_value FROM system_config").fetchall()
+        finally:
+            conn.close()
+        self._values = {r["config_key"]: r["config_value"] for r in rows}
+        self._version = version
+        self._derived = {}
+        self.reloads += 1
+
+    def _fresh(self):
+        """返回当前有效的 (配置字典, 派生值字典)，过期时先重新加载"""
+        with self._lock:
+            now = time.monotonic()
+            if self._values is None or now - self._checked_at >= self.check_interval:
+                self._load()
+                self._checked_at = now
+            else:
+                self.hits += 1
+            return self._values, self._derived
+
+    def get(self, key, default=None):
+        values, _ = self._fresh()
+        return values.get(key, default)
+
+    def get_int(self, key, default=0):
+        try:
+            return int(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key, default=False):
+        value = self.get(key)
+        if value is None:
+            return default
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+    def derived(self, name, build):
+        """按配置版本缓存派生值，build(values) 只在配置变化后重新计算"""
+        values, derived = self._fresh()
+        if name not in derived:
+            derived[name] = build(values)
+        return derived[name]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "keys": len(self._values) if self._values is not None else 0,
+                "hits": self.hits,
+                "reloads": self.reloads,
+                "version_checks": self.version_checks,
+                "check_interval": self.check_interval,
+            }
+
+
+_config_cache = ConfigCache(CONFIG_CACHE_CHECK_INTERVAL)
+
+
 def get_config(key, default=None):
-    """获取系统配置"""
-    conn = get_conn()
-    row = conn.execute(
-        "SELECT config_value FROM system_config WHERE config_key = ?", (key,)
-    ).fetchone()
-    conn.close()
-    return row["config_value"] if row else default
+    """获取系统配置（读取进程内缓存）"""
+    return _config_cache.get(key, default)
+
+
+def get_config_int(key, default=0):
+    return _config_cache.get_int(key, default)
+
+
+def get_config_bool(key, default=False):
+    return _config_cache.get_bool(key, default)
+
+
+def get_config_cache_stats():
+    return _config_cache.stats()
+
+
+def set_configs(values, descriptions=None):
+    """在一个事务中批量设置系统配置"""
+    descriptions = descriptions or {}
+    rows = [(key, value, descriptions.get(key)) for key, value in values.items()]
+    if not rows:
+        return
+
+    def _write(conn):
+        conn.executemany(
+            """INSERT INTO system_config (config_key, config_value, description, updated_at)
+               VALUES (?, ?, ?, datetime('now'))
+               ON CONFLICT(config_key) DO UPDATE SET 
+               config_value = excluded.config_value,
+               description = COALESCE(excluded.description, description),
+               updated_at = datetime('now')""",
+            rows
+        )
+
+    try:
+        run_write(_write)
+    finally:
+        _config_cache.invalidate()
 
 
 def set_config(key, value, description=None):
     """设置系统配置"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """INSERT INTO system_config (config_key, config_value, description, updated_at)
-           VALUES (?, ?, ?, datetime('now'))
-           ON CONFLICT(config_key) DO UPDATE SET 
-           config_value = excluded.config_value,
-           description = COALESCE(excluded.description, description),
-           updated_at = datetime('now')""",
-        (key, value, description)
-    )
-    conn.commit()
-    conn.close()
+    set_configs({key: value}, {key: description})
 
 
-def get_smtp_config():
-    """获取 SMTP 配置"""
-    config_keys = [
-        'smtp_server', 'smtp_port', 'smtp_username', 'smtp_password',
-        'smtp_from_name', 'smtp_from_email', 'smtp_use_ssl', 'smtp_use_tls', 'smtp_enabled'
-    ]
+def _build_smtp_config(values):
     config = {}
-    for key in config_keys:
-        value = get_config(key)
+    for key in SMTP_CONFIG_KEYS:
+        value = values.get(key)
         if value is not None:
             if key == 'smtp_password' and value:
                 try:
@@ -478,8 +1409,13 @@ def get_smtp_config():
     return config
 
 
+def get_smtp_config():
+    """获取 SMTP 配置（密码只在配置变化后解密一次）"""
+    return dict(_config_cache.derived("smtp", _build_smtp_config))
+
+
 def update_smtp_config(config_dict):
-    """更新 SMTP 配置"""
+    """更新 SMTP 配置（一个事务内写入全部字段）"""
     descriptions = {
         'smtp_server': 'SMTP服务器地址',
         'smtp_port': 'SMTP端口',
@@ -491,10 +1427,12 @@ def update_smtp_config(config_dict):
         'smtp_use_tls': '使用TLS',
         'smtp_enabled': '启用SMTP'
     }
+    values = {}
     for key, value in config_dict.items():
         if key == 'smtp_password' and value:
             value = encrypt_password(value)
-        set_config(key, value, descriptions.get(key))
+        values[key] = value
+    set_configs(values, descriptions)
 
 
 def get_user_by_email(email):
@@ -601,17 +1539,15 @@ def create_email_verification(user_id, email, code, verification_type='register'
     if expires_at is None:
         expires_at = datetime.now() + timedelta(minutes=30)
     
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """INSERT INTO email_verifications (user_id, email, code, type, expires_at)
-           VALUES (?, ?, ?, ?, ?)""",
-        (user_id, email, code, verification_type, expires_at)
-    )
-    conn.commit()
-    verification_id = cur.lastrowid
-    conn.close()
-    return verification_id
+    def _write(conn):
+        cur = conn.execute(
+            """INSERT INTO email_verifications (user_id, email, code, type, expires_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (user_id, email, code, verification_type, expires_at)
+        )
+        return cur.lastrowid
+
+    return run_write(_write)
 
 
 def get_valid_email_verification(email, code, verification_type=None):
@@ -678,6 +1614,162 @@ def get_user_email_verified(user_id):
     return dict(row) if row else None
 
 
+# ---------------- Email job queue ----------------
+# 已发送 / 最终失败的邮件记录保留时间（秒），过期后删除
+EMAIL_JOB_RETENTION = float(os.environ.get("EMAIL_JOB_RETENTION", str(24 * 3600)))
+
+
+def enqueue_email(to_email, subject, html_body):
+    """把邮件加入发送队列，返回任务 id"""
+    now = time.time()
+
+    def _write(conn):
+        cur = conn.execute(
+            """INSERT INTO email_jobs (to_email, subject, html_body, next_attempt_at, created_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (to_email, subject, html_body, now, now),
+        )
+        return cur.lastrowid
+
+    return run_write(_write)
+
+
+def claim_due_emails(limit=10, min_interval=0):
+    """取出到期的待发送邮件并标记为 sending，返回 (任务列表, 需要等待的秒数)
+
+    min_interval 大于 0 时，距离上一次（任何进程）取出任务不足 min_interval 秒则不取任务，
+    并返回还需等待的时间，使发送速率限制对所有 worker 整体生效。
+    返回的任务带有本次的 claimed_at，之后续期和标记结果时需要传回。
+    """
+    def _wait(conn, now):
+        if min_interval <= 0:
+            return 0
+        last = conn.execute("SELECT MAX(claimed_at) FROM email_jobs").fetchone()[0]
+        if last is None or now - last >= min_interval:
+            return 0
+        return last + min_interval - now
+
+    # 先用只读查询确认有到期任务且未被限速，避免空闲时每次轮询都开启写事务
+    now = time.time()
+    conn = get_conn()
+    try:
+        due = conn.execute(
+            "SELECT 1 FROM email_jobs WHERE status = 'pending' AND next_attempt_at <= ? LIMIT 1", (now,)
+        ).fetchone()
+        wait = _wait(conn, now) if due else 0
+    finally:
+        conn.close()
+    if not due or wait:
+        return [], wait
+
+    def _write(conn):
+        now = time.time()
+        # 写事务（BEGIN IMMEDIATE）在进程间串行执行，这里的检查对所有 worker 有效
+        wait = _wait(conn, now)
+        if wait:
+            return [], wait
+        rows = conn.execute(
+            """SELECT * FROM email_jobs WHERE status = 'pending' AND next_attempt_at <= ?
+               ORDER BY next_attempt_at, id LIMIT ?""",
+            (now, limit),
+        ).fetchall()
+        jobs = [dict(row, status='sending', claimed_at=now) for row in rows]
+        if jobs:
+            conn.executemany(
+                "UPDATE email_jobs SET status = 'sending', claimed_at = ? WHERE id = ?",
+                [(now, job["id"]) for job in jobs],
+            )
+        return jobs, 0
+
+    return run_write(_write)
+
+
+def renew_email_claim(job_id, claimed_at):
+    """确认任务仍由调用方持有并刷新租期，返回新的 claimed_at；
+    任务已因超时被放回队列（或被其他 worker 重新取出）时返回 None"""
+    def _write(conn):
+        now = time.time()
+        cur = conn.execute(
+            "UPDATE email_jobs SET claimed_at = ? WHERE id = ? AND status = 'sending' AND claimed_at = ?",
+            (now, job_id, claimed_at),
+        )
+        return now if cur.rowcount else None
+
+    return run_write(_write)
+
+
+def mark_email_sent(job_id, claimed_at):
+    """标记邮件已发送，并清空正文（其中可能包含验证码）；任务已不由调用方持有时返回 False"""
+    now = time.time()
+    cur = run_write(lambda conn: conn.execute(
+        """UPDATE email_jobs SET status = 'sent', sent_at = ?, attempts = attempts + 1,
+               html_body = '', last_error = NULL
+           WHERE id = ? AND status = 'sending' AND claimed_at = ?""",
+        (now, job_id, claimed_at),
+    ))
+    return cur.rowcount > 0
+
+
+def mark_email_failed(job_id, claimed_at, error, next_attempt_at=None):
+    """记录一次发送失败；next_attempt_at 为 None 时不再重试。任务已不由调用方持有时返回 False"""
+    if next_attempt_at is None:
+        sql = """UPDATE email_jobs SET status = 'failed', attempts = attempts + 1,
+                     html_body = '', last_error = ?
+                 WHERE id = ? AND status = 'sending' AND claimed_at = ?"""
+        params = (error, job_id, claimed_at)
+    else:
+        sql = """UPDATE email_jobs SET status = 'pending', attempts = attempts + 1,
+                     last_error = ?, next_attempt_at = ?
+                 WHERE id = ? AND status = 'sending' AND claimed_at = ?"""
+        params = (error, next_attempt_at, job_id, claimed_at)
+    cur = run_write(lambda conn: conn.execute(sql, params))
+    return cur.rowcount > 0
+
+
+def requeue_stale_email_jobs(lease):
+    """把进入 sending 状态超过 lease 秒的任务放回队列（发送进程已崩溃或被重启），并删除过期的已完成记录
+
+    仍在租期内的任务可能正由其他 worker 发送，不会被放回，避免同一封邮件发送两次。
+    """
+    def _write(conn):
+        conn.execute(
+            """UPDATE email_jobs SET status = 'pending', claimed_at = NULL
+               WHERE status = 'sending' AND (claimed_at IS NULL OR claimed_at < ?)""",
+            (time.time() - lease,),
+        )
+        conn.execute(
+            "DELETE FROM email_jobs WHERE status IN ('sent', 'failed') AND created_at < ?",
+            (time.time() - EMAIL_JOB_RETENTION,),
+        )
+
+    return run_write(_write)
+
+
+def get_email_job(job_id):
+    conn = get_conn()
+    row = conn.execute(
+        """SELECT id, to_email, subject, status, attempts, last_error, created_at, sent_at
+           FROM email_jobs WHERE id = ?""",
+        (job_id,),
+    ).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def get_email_queue_counts():
+    """按状态统计邮件任务数量，以及下一封待发送邮件的时间"""
+    conn = get_conn()
+    rows = conn.execute("SELECT status, COUNT(*) FROM email_jobs GROUP BY status").fetchall()
+    next_row = conn.execute(
+        "SELECT MIN(next_attempt_at) FROM email_jobs WHERE status = 'pending'"
+    ).fetchone()
+    conn.close()
+    counts = {"pending": 0, "sending": 0, "sent": 0, "failed": 0}
+    counts.update({row[0]: row[1] for row in rows})
+    counts["next_attempt_at"] = next_row[0]
+    return counts
+
+
 # ---------------- Article sources management ----------------
 def add_article_source(name, url, api_validation=None, polling_algorithm="sequential", enabled=1, order_index=None):
     """添加文章源，返回新插入的 id"""
@@ -717,7 +1809,8 @@ def get_article_source_by_id(source_id):
     return dict(row) if row else None
 
 
-def update_article_source(source_id, name=None, url=None, api_validation=None, polling_algorithm=None, enabled=None, order_index=None):
+def update_article_source(source_id, name=None, url=None, api_validation=None, polling_algorithm=None, enabled=None, order_index=None,
+                          prefetch_size=None, prefetch_interval=None, max_response_bytes=None):
     conn = get_conn()
     cur = conn.cursor()
     # 确认存在
@@ -746,6 +1839,15 @@ def update_article_source(source_id, name=None, url=None, api_validation=None, p
     if order_index is not None:
         fields.append("order_index = ?")
         params.append(int(order_index))
+    if prefetch_size is not None:
+        fields.append("prefetch_size = ?")
+        params.append(int(prefetch_size))
+    if prefetch_interval is not None:
+        fields.append("prefetch_interval = ?")
+        params.append(float(prefetch_interval))
+    if max_response_bytes is not None:
+        fields.append("max_response_bytes = ?")
+        params.append(int(max_response_bytes))
 
     if not fields:
         conn.close()
@@ -780,12 +1882,156 @@ def toggle_article_source(source_id):
     return True
 
 
+# === 文章源获取存档 ===
+
+# 存档文章的保留时间（秒）和最多保留的条数，超出后淘汰最早获取的
+FETCHED_ARTICLE_TTL = float(os.environ.get("FETCHED_ARTICLE_TTL", str(7 * 24 * 3600)))
+FETCHED_ARTICLE_MAX_ROWS = int(os.environ.get("FETCHED_ARTICLE_MAX_ROWS", "2000"))
+
+
+def archive_fetched_article(source_id, article, wait=False):
+    """存档一篇从文章源获取的文章
+
+    同一个源内容相同的文章只保存一份（只刷新获取时间），写入后按 TTL 和条数上限淘汰旧存档。
+    默认异步写入，不阻塞调用方；wait=True 时等待写入完成并返回存档 id。
+    """
+    content_hash = compute_content_hash(article.get("title"), article.get("content"))
+    upstream_id = article.get("id")
+    params = (
+        source_id,
+        content_hash,
+        str(upstream_id) if upstream_id is not None else None,
+        article.get("title"),
+        article.get("author"),
+        article.get("content"),
+        article.get("source"),
+        time.time(),
+    )
+
+    def _write(conn):
+        conn.execute(
+            """INSERT INTO fetched_articles
+                   (source_id, content_hash, upstream_id, title, author, content, source_name, fetched_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(source_id, content_hash) DO UPDATE SET
+                   fetched_at = excluded.fetched_at, upstream_id = excluded.upstream_id""",
+            params,
+        )
+        row_id = conn.execute(
+            "SELECT id FROM fetched_articles WHERE source_id = ? AND content_hash = ?",
+            (source_id, content_hash),
+        ).fetchone()[0]
+        conn.execute("DELETE FROM fetched_articles WHERE fetched_at < ?", (time.time() - FETCHED_ARTICLE_TTL,))
+        conn.execute(
+            """DELETE FROM fetched_articles WHERE id IN (
+                   SELECT id FROM fetched_articles ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)""",
+            (max(0, FETCHED_ARTICLE_MAX_ROWS),),
+        )
+        return row_id
+
+    if wait:
+        return run_write(_write)
+    submit_write(_write)
+    return None
+
+
+def get_archived_article(source_ids=None):
+    """从存档中取一篇未过期的文章（优先最久没有被返回过的），没有时返回 None"""
+    conn = get_conn()
+    sql = """SELECT id, upstream_id, content_hash, title, author, content, source_name, fetched_at
+             FROM fetched_articles WHERE fetched_at >= ?"""
+    params = [time.time() - FETCHED_ARTICLE_TTL]
+    if source_ids:
+        sql += " AND source_id IN (%s)" % ",".join("?" * len(source_ids))
+        params.extend(source_ids)
+    sql += " ORDER BY last_served_at, fetched_at DESC LIMIT 1"
+    row = conn.execute(sql, params).fetchone()
+    conn.close()
+    if not row:
+        return None
+    row_id = row["id"]
+    now = time.time()
+    submit_write(lambda c: c.execute(
+        "UPDATE fetched_articles SET last_served_at = ? WHERE id = ?", (now, row_id)
+    ))
+    return dict(row)
+
+
+def get_fetched_article_stats():
+    conn = get_conn()
+    row = conn.execute("SELECT COUNT(*), MIN(fetched_at) FROM fetched_articles").fetchone()
+    conn.close()
+    return {
+        "count": row[0],
+        "oldest_age": round(time.time() - row[1], 1) if row[1] is not None else None,
+        "max_rows": FETCHED_ARTICLE_MAX_ROWS,
+        "ttl": FETCHED_ARTICLE_TTL,
+    }
+
+
+# === 每日共享文章 ===
+
+def _daily_article_from_row(row):
+    return {
+        "id": row["article_id"],
+        "title": row["title"],
+        "author": row["author"],
+        "content": row["content"],
+        "source": row["source"],
+        "date": row["day"],
+    }
+
+
+def get_daily_article(day):
+    """获取某一天固定的共享文章，没有时返回 None"""
+    conn = get_conn()
+    row = conn.execute("SELECT * FROM daily_articles WHERE day = ?", (day,)).fetchone()
+    conn.close()
+    return _daily_article_from_row(row) if row else None
+
+
+def pin_daily_article(day, article, replace=False):
+    """把文章固定为某一天的共享文章，返回最终固定的文章
+
+    replace=False 时如果当天已经有固定的文章（例如另一个进程先写入）则保留已有的。
+    """
+    params = (
+        day,
+        str(article.get("id")) if article.get("id") is not None else None,
+        article.get("title"),
+        article.get("author"),
+        article.get("content"),
+        article.get("source"),
+    )
+
+    def _write(conn):
+        conn.execute(
+            """INSERT INTO daily_articles (day, article_id, title, author, content, source)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(day) DO """ + (
+                """UPDATE SET article_id = excluded.article_id, title = excluded.title,
+                       author = excluded.author, content = excluded.content,
+                       source = excluded.source, pinned_at = CURRENT_TIMESTAMP"""
+                if replace else "NOTHING"
+            ),
+            params,
+        )
+        row = conn.execute("SELECT * FROM daily_articles WHERE day = ?", (day,)).fetchone()
+        return _daily_article_from_row(row)
+
+    return run_write(_write)
+
+
+# 支持的轮询算法：顺序、随机、加权轮询、最低延迟、二选一（power of two choices）
+POLLING_ALGORITHMS = ("sequential", "random", "weighted_round_robin", "least_latency", "power_of_two")
+
+
 def get_global_polling_algorithm(default="sequential"):
     val = get_config("global_polling_algorithm", default)
-    return val if val in ("sequential", "random") else default
+    return val if val in POLLING_ALGORITHMS else default
 
 
 def set_global_polling_algorithm(algorithm):
-    if algorithm not in ("sequential", "random"):
+    if algorithm not in POLLING_ALGORITHMS:
         algorithm = "sequential"
     set_config("global_polling_algorithm", algorithm, description="全局文章源轮询算法")
@@ -3,29 +3,52 @@ import re
 import sqlite3
 import requests
 import shutil  # 新增：用于文件复制
+import smtplib
 import random
 import string
 import base64
 import zipfile
+import tarfile
+import tempfile
+import html
 import io
+import json
+import codecs
+import gzip
+import hashlib
+import zlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from io import BytesIO
 from functools import wraps
-from flask import Flask, request, jsonify, session, send_from_directory, send_file
+from flask import Flask, Response, request, jsonify, session, send_file, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
-from captcha.image import ImageCaptcha  # 验证码图片生成
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+try:
+    import brotli  # 已列入 requirements.txt；开发环境未安装时 index.html 只提供 gzip 压缩
+except ImportError:
+    brotli = None
 
 # 导入数据库函数
 from database import (
+    ProcessLocal,
     init_db,
     get_conn,
     get_user_by_username,
     create_user,
     verify_user,
     get_favorites,
+    get_favorites_page,
+    get_favorite_by_id,
+    iter_favorites_for_export,
     add_favorite,
     remove_favorite,
     get_all_users,
@@ -34,8 +57,12 @@ from database import (
     delete_users,
     get_user_username,
     get_uploaded_articles,
+    get_uploaded_articles_page,
     get_uploaded_article_by_id,
     save_uploaded_article,
+    insert_uploaded_article,
+    compute_content_hash,
+    insert_uploaded_articles_batch,
     delete_uploaded_article,
     delete_all_uploaded_articles,
     DATA_DIR,
@@ -65,8 +92,28 @@ from database import (
     toggle_article_source,
     get_global_polling_algorithm,
     set_global_polling_algorithm,
+    POLLING_ALGORITHMS,
+    archive_fetched_article,
+    get_archived_article,
+    get_fetched_article_stats,
+    get_daily_article,
+    pin_daily_article,
+    enqueue_email,
+    claim_due_emails,
+    renew_email_claim,
+    mark_email_sent,
+    mark_email_failed,
+    requeue_stale_email_jobs,
+    get_email_job,
+    get_email_queue_counts,
     update_user_email_with_verification,
     get_user_email_verified,
+    reset_pool,
+    begin_request_conn_count,
+    get_request_conn_count,
+    get_pool_stats,
+    get_writer_stats,
+    get_config_cache_stats,
 )
 
 PRELOADED_DB_PATH = "/app/preloaded_data/data.db"
@@ -115,21 +162,160 @@ limiter = Limiter(
     storage_uri="memory://"
 )
 
+def is_admin_session():
+    """当前会话用户是否为管理员"""
+    user_id = session.get("user_id")
+    if user_id is None:
+        return False
+    conn = get_conn()
+    row = conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+    conn.close()
+    return bool(row and row["role"] == "admin")
+
+
 def admin_required(f):
     """管理员权限装饰器"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if "user_id" not in session:
             return jsonify({"error": "unauthorized"}), 401
-        user_id = session.get("user_id")
-        conn = get_conn()
-        row = conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
-        conn.close()
-        if not row or row["role"] != "admin":
+        if not is_admin_session():
             return jsonify({"error": "forbidden"}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+@app.before_request
+def _begin_db_conn_count():
+    begin_request_conn_count()
+
+
+@app.after_request
+def _report_db_conn_count(response):
+    # 报告本次请求获取数据库连接的次数，便于观察连接池复用效果
+    response.headers["X-DB-Connections"] = str(get_request_conn_count())
+    return response
+
+
+# === 响应压缩 ===
+
+# 压缩开关、最小压缩大小（字节）、gzip 压缩级别、按块流式压缩的阈值（字节）和需要压缩的响应类型
+COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
+COMPRESS_STREAM_THRESHOLD = int(os.environ.get("COMPRESS_STREAM_THRESHOLD", str(1024 * 1024)))
+COMPRESS_MIMETYPES = frozenset(
+    t.strip() for t in os.environ.get(
+        "COMPRESS_MIMETYPES", "application/json,application/x-ndjson,text/plain,text/csv"
+    ).split(",") if t.strip()
+)
+COMPRESS_CHUNK_SIZE = 64 * 1024
+
+
+class CompressionStats:
+    """按路由统计压缩前后的字节数和压缩耗费的 CPU 时间"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, bytes_in, bytes_out, cpu_seconds):
+        with self._lock:
+            entry = self._routes.setdefault(route, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu": 0.0})
+            entry["responses"] += 1
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu"] += cpu_seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                route: {
+                    "responses": e["responses"],
+                    "bytes_in": e["bytes_in"],
+                    "bytes_out": e["bytes_out"],
+                    "ratio": round(e["bytes_out"] / e["bytes_in"], 3) if e["bytes_in"] else None,
+                    "cpu_ms": round(e["cpu"] * 1000, 2),
+                }
+                for route, e in self._routes.items()
+            }
+
+
+compression_stats = CompressionStats()
+
+
+def _gzip_stream(chunks, route):
+    """逐块 gzip 压缩，每块之后 flush，保证流式响应（如 NDJSON 进度）能及时送达客户端"""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    bytes_in = bytes_out = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            started = time.thread_time()
+            out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            cpu += time.thread_time() - started
+            bytes_in += len(chunk)
+            bytes_out += len(out)
+            yield out
+        out = compressor.flush()
+        bytes_out += len(out)
+        yield out
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        compression_stats.record(route, bytes_in, bytes_out, cpu)
+
+
+def _iter_slices(data):
+    for offset in range(0, len(data), COMPRESS_CHUNK_SIZE):
+        yield data[offset:offset + COMPRESS_CHUNK_SIZE]
+
+
+@app.after_request
+def _compress_response(response):
+    """按 Accept-Encoding 对 JSON 等文本响应做 gzip 压缩
+
+    小于 COMPRESS_MIN_SIZE 的响应不压缩；流式响应和大于 COMPRESS_STREAM_THRESHOLD 的响应按块压缩，
+    不在内存中再保存一份完整的压缩结果。
+    """
+    if (
+        not COMPRESS_ENABLED
+        or request.method == "HEAD"
+        or response.mimetype not in COMPRESS_MIMETYPES
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.direct_passthrough
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if _parse_accept_encoding(request.headers.get("Accept-Encoding")).get("gzip", 0) <= 0:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else request.path
+    if response.is_streamed:
+        response.response = _gzip_stream(response.iter_encoded(), route)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        if len(data) >= COMPRESS_STREAM_THRESHOLD:
+            response.response = _gzip_stream(_iter_slices(data), route)
+        else:
+            started = time.thread_time()
+            compressed = gzip.compress(data, COMPRESS_LEVEL)
+            compression_stats.record(route, len(data), len(compressed), time.thread_time() - started)
+            response.set_data(compressed)
+    if response.is_streamed:
+        # 按块压缩时长度未知
+        response.headers.pop("Content-Length", None)
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
 # 工具函数：从文章内容头部移除标题/作者等元信息（可选，防止上传时把元信息当作正文内容）
 def strip_header_lines(text: str) -> str:
     if not isinstance(text, str):
@@ -176,43 +362,239 @@ def validate_password(password: str) -> tuple[bool, str]:
 
     return True, ""
 
-def send_html_email(to_email, subject, html_body):
-    """发送HTML邮件"""
-    import smtplib
+def _build_email_message(config, to_email, subject, html_body):
+    """按 SMTP 配置构造 HTML 邮件，返回 (发件地址, 邮件内容)"""
     from email.mime.text import MIMEText
     from email.mime.multipart import MIMEMultipart
-    
-    config = get_smtp_config()
-    
-    if not config.get('smtp_server'):
-        raise Exception("SMTP未配置")
-    
-    smtp_server = config.get("smtp_server", "")
-    smtp_port = int(config.get("smtp_port", 587))
+
     smtp_username = config.get("smtp_username", "")
-    smtp_password = config.get("smtp_password", "")
     from_name = config.get("smtp_from_name", "ReadZen")
     from_email = config.get("smtp_from_email", smtp_username)
-    use_ssl = config.get("smtp_use_ssl", "false").lower() == "true"
-    use_tls = config.get("smtp_use_tls", "true").lower() == "true"
-    
+
     msg = MIMEMultipart("alternative")
     msg["From"] = f"{from_name} <{from_email}>"
     msg["To"] = to_email
     msg["Subject"] = subject
-    
+
     msg.attach(MIMEText(html_body, "html", "utf-8"))
-    
+    return from_email, msg.as_string()
+
+
+def _smtp_connection_key(config):
+    """决定能否复用 SMTP 连接的配置项"""
+    return tuple(config.get(key) for key in (
+        "smtp_server", "smtp_port", "smtp_username", "smtp_password", "smtp_use_ssl", "smtp_use_tls"
+    ))
+
+
+def _open_smtp(config, timeout=10):
+    """按 SMTP 配置建立连接并登录"""
+    if not config.get('smtp_server'):
+        raise Exception("SMTP未配置")
+
+    smtp_server = config.get("smtp_server", "")
+    smtp_port = int(config.get("smtp_port", 587))
+    use_ssl = config.get("smtp_use_ssl", "false").lower() == "true"
+    use_tls = config.get("smtp_use_tls", "true").lower() == "true"
+
     if use_ssl:
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=10)
+        server = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=timeout)
     else:
-        server = smtplib.SMTP(smtp_server, smtp_port, timeout=10)
+        server = smtplib.SMTP(smtp_server, smtp_port, timeout=timeout)
         if use_tls:
             server.starttls()
-    
-    server.login(smtp_username, smtp_password)
-    server.sendmail(from_email, to_email, msg.as_string())
-    server.quit()
+
+    server.login(config.get("smtp_username", ""), config.get("smtp_password", ""))
+    return server
+
+
+# === 邮件发送队列 ===
+
+# 最多尝试次数、首次重试延迟（秒，之后每次翻倍）和最大重试延迟
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_DELAY = float(os.environ.get("EMAIL_RETRY_DELAY", "30"))
+EMAIL_RETRY_MAX_DELAY = float(os.environ.get("EMAIL_RETRY_MAX_DELAY", "3600"))
+# 每分钟最多发送的邮件数（0 表示不限制），通过 email_jobs 表对所有 worker 整体生效
+EMAIL_RATE_PER_MINUTE = float(os.environ.get("EMAIL_RATE_PER_MINUTE", "30"))
+# SMTP 连接空闲多久后关闭（秒）；复用空闲超过 EMAIL_SMTP_CHECK_AFTER 秒的连接前先用 NOOP 检查
+EMAIL_SMTP_IDLE_TIMEOUT = float(os.environ.get("EMAIL_SMTP_IDLE_TIMEOUT", "60"))
+EMAIL_SMTP_CHECK_AFTER = 10
+EMAIL_SMTP_TIMEOUT = 10
+# sending 状态的租期（秒）。每次 sendmail 之前都会续期并确认任务仍归自己所有，
+# 因此租期只需覆盖一次 sendmail（MAIL / RCPT / DATA / 正文 / 结束应答，每步最多 EMAIL_SMTP_TIMEOUT 秒）；
+# 超过租期仍未续期的任务视为发送进程已退出，放回队列
+EMAIL_SENDING_LEASE = EMAIL_SMTP_TIMEOUT * 6
+# 没有新任务时检查到期重试任务的周期（秒）
+EMAIL_POLL_INTERVAL = 5
+
+
+class EmailClaimLost(Exception):
+    """任务因租期超时已被放回队列或被其他 worker 取走，当前发送者不能再发送或标记它"""
+
+
+class EmailSender(ProcessLocal):
+    """后台邮件发送线程：从 email_jobs 表取任务发送
+
+    复用已登录的 SMTP 连接（配置变化或空闲超时后重新连接），发送失败按指数退避重试，
+    并按 EMAIL_RATE_PER_MINUTE 限制所有 worker 合计的发送速率。
+    """
+
+    thread_name = "email-sender"
+
+    def _reset_state(self):
+        self._wake = threading.Event()
+        self._smtp = None
+        self._smtp_key = None
+        self._smtp_last_used = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.lost_claims = 0
+        self.connections = 0
+        self.avg_send_ms = None
+        self.last_send_ms = None
+        self.last_error = None
+
+    def ensure_started(self):
+        self._ensure_started()
+
+    def wake(self):
+        self._ensure_started()
+        self._wake.set()
+
+    def _run(self):
+        last_requeue = None
+        while True:
+            # 定期放回超过租期的 sending 任务（其他 worker 崩溃或被重启时遗留）
+            if last_requeue is None or time.monotonic() - last_requeue >= EMAIL_SENDING_LEASE:
+                last_requeue = time.monotonic()
+                try:
+                    requeue_stale_email_jobs(EMAIL_SENDING_LEASE)
+                except Exception as e:
+                    print(f"[WARNING] Failed to requeue email jobs: {e}")
+            wait = 0
+            try:
+                # 每次只取一封，限速由 claim_due_emails 根据所有 worker 最近一次取任务的时间判断
+                min_interval = 60.0 / EMAIL_RATE_PER_MINUTE if EMAIL_RATE_PER_MINUTE > 0 else 0
+                jobs, wait = claim_due_emails(1, min_interval)
+                for job in jobs:
+                    self._send_job(job)
+            except Exception as e:
+                print(f"[WARNING] Email sender error: {e}")
+                jobs = []
+            if not jobs:
+                if self._smtp is not None and time.monotonic() - self._smtp_last_used > EMAIL_SMTP_IDLE_TIMEOUT:
+                    self._close()
+                self._wake.wait(min(wait, EMAIL_POLL_INTERVAL) if wait else EMAIL_POLL_INTERVAL)
+                self._wake.clear()
+
+    @staticmethod
+    def _renew(job):
+        """sendmail 之前续期，任务已不归自己所有时放弃发送"""
+        claimed_at = renew_email_claim(job["id"], job["claimed_at"])
+        if claimed_at is None:
+            raise EmailClaimLost(job["id"])
+        job["claimed_at"] = claimed_at
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+        self._smtp = None
+        self._smtp_key = None
+
+    def _connection(self, config):
+        """返回 (SMTP 连接, 是否复用)"""
+        key = _smtp_connection_key(config)
+        if self._smtp is not None and self._smtp_key == key:
+            if time.monotonic() - self._smtp_last_used < EMAIL_SMTP_CHECK_AFTER:
+                return self._smtp, True
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp, True
+            except Exception:
+                pass
+        self._close()
+        self._smtp = _open_smtp(config, timeout=EMAIL_SMTP_TIMEOUT)
+        self._smtp_key = key
+        self.connections += 1
+        return self._smtp, False
+
+    def _deliver(self, config, job):
+        from_email, message = _build_email_message(config, job["to_email"], job["subject"], job["html_body"])
+        smtp, reused = self._connection(config)
+        try:
+            self._renew(job)
+            smtp.sendmail(from_email, job["to_email"], message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._close()
+            if not reused:
+                raise
+            # 复用的连接可能已被服务器关闭，换新连接再试一次
+            smtp, _ = self._connection(config)
+            self._renew(job)
+            smtp.sendmail(from_email, job["to_email"], message)
+
+    def _send_job(self, job):
+        started = time.monotonic()
+        try:
+            self._deliver(get_smtp_config(), job)
+        except EmailClaimLost:
+            self.lost_claims += 1
+            print(f"[WARNING] Email #{job['id']} was requeued before sending, skipped")
+            return
+        except Exception as e:
+            self._close()
+            self.last_error = str(e)
+            attempts = job["attempts"] + 1
+            if attempts >= EMAIL_MAX_ATTEMPTS or isinstance(e, smtplib.SMTPRecipientsRefused):
+                self.failed += 1
+                print(f"[ERROR] Failed to send email #{job['id']} to {job['to_email']}: {e}")
+                owned = mark_email_failed(job["id"], job["claimed_at"], str(e))
+            else:
+                self.retries += 1
+                delay = min(EMAIL_RETRY_MAX_DELAY, EMAIL_RETRY_DELAY * 2 ** (attempts - 1))
+                print(f"[WARNING] Failed to send email #{job['id']}, retry in {delay:.0f}s: {e}")
+                owned = mark_email_failed(job["id"], job["claimed_at"], str(e), time.time() + delay)
+            if not owned:
+                self.lost_claims += 1
+            return
+        finally:
+            self._smtp_last_used = time.monotonic()
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.last_send_ms = round(elapsed_ms, 1)
+        self.avg_send_ms = round(elapsed_ms if self.avg_send_ms is None else self.avg_send_ms * 0.8 + elapsed_ms * 0.2, 1)
+        self.sent += 1
+        if not mark_email_sent(job["id"], job["claimed_at"]):
+            self.lost_claims += 1
+            print(f"[WARNING] Email #{job['id']} was sent after its lease expired")
+
+    def stats(self):
+        return {
+            "queue": get_email_queue_counts(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "lost_claims": self.lost_claims,
+            "connections": self.connections,
+            "avg_send_ms": self.avg_send_ms,
+            "last_send_ms": self.last_send_ms,
+            "last_error": self.last_error,
+            "rate_per_minute": EMAIL_RATE_PER_MINUTE,
+        }
+
+
+email_sender = EmailSender()
+
+
+def queue_html_email(to_email, subject, html_body):
+    """把HTML邮件加入发送队列并唤醒发送线程，立即返回任务 id"""
+    job_id = enqueue_email(to_email, subject, html_body)
+    email_sender.wake()
+    return job_id
 
 
 def get_email_template(title, greeting, content, code=None, code_label="验证码", expiry_hours=None):
@@ -285,7 +667,7 @@ def get_email_template(title, greeting, content, code=None, code_label="验证
 
 
 def send_verification_email(to_email, code, username, email_type="register"):
-    """发送邮箱验证邮件
+    """把邮箱验证邮件加入发送队列，返回任务 id
     
     Args:
         to_email: 收件人邮箱
@@ -305,120 +687,213 @@ def send_verification_email(to_email, code, username, email_type="register"):
         content = "请使用上面的验证码完成邮箱验证。验证码只能使用一次，请勿泄露给他人。"
     
     html_body = get_email_template(title, greeting, content, code, "邮箱验证码", 24)
-    send_html_email(to_email, subject, html_body)
+    return queue_html_email(to_email, subject, html_body)
+
+# === 图形验证码 ===
+
+# 后台预先生成的验证码数量（0 表示关闭预生成，每次请求时实时生成）
+CAPTCHA_POOL_SIZE = int(os.environ.get("CAPTCHA_POOL_SIZE", "32"))
+CAPTCHA_LENGTH = 4
+CAPTCHA_CHARSET = string.ascii_uppercase + string.digits
+CAPTCHA_WIDTH, CAPTCHA_HEIGHT = 176, 56
+CAPTCHA_FONT_SIZE = 32
+CAPTCHA_BG_COLOR = '#fdfbf7'
+CAPTCHA_TEXT_COLOR = '#374151'
+CAPTCHA_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSansBold.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "C:\\Windows\\Fonts\\arial.ttf",
+    "arial.ttf",
+]
+# 可以直接返回图片字节的格式 -> MIME 类型
+CAPTCHA_IMAGE_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+
+class CaptchaRenderer:
+    """验证码图片绘制：字体只加载一次，每个字符的字形渲染一次后缓存为蒙版"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._font = None
+        self._glyphs = {}
+
+    def _get_font(self):
+        if self._font is None:
+            with self._lock:
+                if self._font is None:
+                    self._font = self._load_font()
+        return self._font
+
+    @staticmethod
+    def _load_font():
+        from PIL import ImageFont
+
+        for font_path in CAPTCHA_FONT_PATHS:
+            try:
+                return ImageFont.truetype(font_path, CAPTCHA_FONT_SIZE)
+            except OSError:
+                continue
+        try:
+            return ImageFont.load_default(size=CAPTCHA_FONT_SIZE)
+        except TypeError:
+            # Pillow < 10.1 的默认字体不支持指定大小
+            return ImageFont.load_default()
+
+    def _glyph(self, char):
+        """返回 (蒙版, 宽, 高)：蒙版贴在 (x, y) 处等同于 draw.text((x, y), char)"""
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            from PIL import Image, ImageDraw
+
+            font = self._get_font()
+            bbox = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), char, font=font)
+            mask = Image.new("L", (max(1, bbox[2]), max(1, bbox[3])), 0)
+            ImageDraw.Draw(mask).text((0, 0), char, fill=255, font=font)
+            glyph = (mask, bbox[2] - bbox[0], bbox[3] - bbox[1])
+            self._glyphs[char] = glyph
+        return glyph
+
+    def render(self, code, bg_color=CAPTCHA_BG_COLOR, text_color=CAPTCHA_TEXT_COLOR):
+        """绘制验证码，返回 PIL Image"""
+        from PIL import Image, ImageDraw
+
+        width, height = CAPTCHA_WIDTH, CAPTCHA_HEIGHT
+        img = Image.new('RGB', (width, height), bg_color)
+        draw = ImageDraw.Draw(img)
+
+        # 添加干扰线
+        for _ in range(2):
+            x1 = random.randint(0, width - 1)
+            y1 = random.randint(0, height - 1)
+            x2 = random.randint(0, width - 1)
+            y2 = random.randint(0, height - 1)
+            draw.line([(x1, y1), (x2, y2)], fill=text_color, width=1)
+
+        # 添加干扰点
+        for _ in range(15):
+            x = random.randint(0, width - 1)
+            y = random.randint(0, height - 1)
+            draw.point((x, y), fill=text_color)
+
+        # 动态计算字符布局，确保完全填充
+        margin = 10
+        available_width = width - 2 * margin
+        char_width = available_width // len(code) if code else available_width
+
+        for i, char in enumerate(code):
+            mask, glyph_width, glyph_height = self._glyph(char)
+            # 水平居中在字符格子内，垂直居中在整个图片内，加上微小随机偏移
+            x = margin + i * char_width + (char_width - glyph_width) // 2 + random.randint(-1, 1)
+            y = (height - glyph_height) // 2 + random.randint(-2, 2)
+            img.paste(text_color, (x, y), mask)
+        return img
+
+
+def encode_captcha_image(img, image_format="png"):
+    """把验证码图片编码为 PNG 或 WebP 字节"""
+    buf = io.BytesIO()
+    if image_format == "webp":
+        img.save(buf, format="WEBP", lossless=True)
+    else:
+        img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
 
-# 验证码图片生成器
-captcha_generator = ImageCaptcha(width=160, height=60)
 
+captcha_renderer = CaptchaRenderer()
 
-def generate_custom_captcha(code: str, bg_color: str = '#fdfbf7', text_color: str = '#374151'):
-    """生成自定义背景色的验证码图片"""
-    from PIL import Image, ImageDraw, ImageFont
-    import random
-    
-    width, height = 176, 56
-    img = Image.new('RGB', (width, height), bg_color)
-    draw = ImageDraw.Draw(img)
-    
-    font_size = 32
-    font = None
-    font_paths = [
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        "/usr/share/fonts/truetype/freefont/FreeSansBold.ttf",
-        "/System/Library/Fonts/Helvetica.ttc",
-        "C:\\Windows\\Fonts\\arial.ttf",
-        "arial.ttf",
-    ]
-    for font_path in font_paths:
-        try:
-            font = ImageFont.truetype(font_path, font_size)
-            break
-        except:
-            continue
-    
-    if font is None:
-        try:
-            font = ImageFont.load_default(size=font_size)
-        except:
-            try:
-                font = ImageFont.load_default()
-            except:
-                font = None
-    
-    # 添加干扰线
-    for _ in range(2):
-        x1 = random.randint(0, width - 1)
-        y1 = random.randint(0, height - 1)
-        x2 = random.randint(0, width - 1)
-        y2 = random.randint(0, height - 1)
-        draw.line([(x1, y1), (x2, y2)], fill=text_color, width=1)
-    
-    # 添加干扰点
-    for _ in range(15):
-        x = random.randint(0, width - 1)
-        y = random.randint(0, height - 1)
-        draw.point((x, y), fill=text_color)
-    
-    # 动态计算字符布局，确保完全填充
-    n_chars = len(code)
-    
-    margin = 10
-    available_width = width - 2 * margin
-    char_width = available_width // n_chars if n_chars > 0 else available_width
-    
-    # 绘制验证码文字，完全填充整个可用宽度
-    for i, char in enumerate(code):
-        # 计算字符基础位置
-        base_x = margin + i * char_width
-        
-        # 添加微小随机偏移（减少以保持填充效果）
-        x = base_x + random.randint(-1, 1)
-        
-        # 垂直居中，加上微小偏移
-        if font:
-            try:
-                # 获取字符实际大小以进行精确居中
-                bbox = draw.textbbox((0, 0), char, font=font)
-                char_width_actual = bbox[2] - bbox[0]
-                char_height_actual = bbox[3] - bbox[1]
-                
-                # 水平居中在字符格子内
-                x_offset = (char_width - char_width_actual) // 2
-                x = base_x + x_offset + random.randint(-1, 1)
-                
-                # 垂直居中在整个图片内
-                y = (height - char_height_actual) // 2 + random.randint(-2, 2)
-                
-                draw.text((x, y), char, fill=text_color, font=font)
-            except:
-                # 降级处理
-                x = base_x + random.randint(-1, 1)
-                y = (height - 20) // 2 + random.randint(-2, 2)
-                draw.text((x, y), char, fill=text_color, font=font)
-        else:
-            x = base_x + random.randint(-1, 1)
-            y = (height - 20) // 2 + random.randint(-2, 2)
-            draw.text((x, y), char, fill=text_color)
-    
-    # 转换为字节流
-    img_byte_arr = io.BytesIO()
-    img.save(img_byte_arr, format='PNG')
-    return img_byte_arr.getvalue()
+
+class CaptchaPool(ProcessLocal):
+    """后台线程维护一个有界的预生成验证码池，请求时直接取用，池为空时实时生成
+
+    每个验证码只会被取出一次。
+    """
+
+    thread_name = "captcha-pool"
+
+    def __init__(self, size):
+        self.size = max(0, size)
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def _reset_state(self):
+        self._items = deque()
+        self._wake = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _generate():
+        import secrets
+
+        code = ''.join(secrets.choice(CAPTCHA_CHARSET) for _ in range(CAPTCHA_LENGTH))
+        img = captcha_renderer.render(code)
+        return code, img, encode_captcha_image(img)
+
+    def get(self):
+        """取出一个验证码，返回 (code, PIL Image, PNG 字节)"""
+        if self.size <= 0:
+            return self._generate()
+        self._ensure_started()
+        with self._lock:
+            item = self._items.popleft() if self._items else None
+            if item is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._wake.set()
+        return item or self._generate()
+
+    def _run(self):
+        while True:
+            while len(self._items) < self.size:
+                try:
+                    item = self._generate()
+                except Exception as e:
+                    print(f"[WARNING] Failed to pre-render captcha: {e}")
+                    break
+                with self._lock:
+                    self._items.append(item)
+            self._wake.wait()
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "available": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+captcha_pool = CaptchaPool(CAPTCHA_POOL_SIZE)
 
 
 @app.route("/api/captcha", methods=["GET"])
 def get_captcha():
-    """生成并返回验证码图片"""
-    import secrets
-    captcha_code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(4))
+    """生成并返回验证码图片
+
+    默认返回 JSON（base64 编码的 PNG）；?format=png 或 ?format=webp 时直接返回图片字节。
+    """
+    image_format = request.args.get("format")
+    if image_format is not None and image_format not in CAPTCHA_IMAGE_FORMATS:
+        return jsonify({"error": "format必须是png或webp"}), 400
+
+    captcha_code, img, png_data = captcha_pool.get()
     session["captcha"] = captcha_code
     session["captcha_time"] = datetime.now().timestamp()
 
-    image_data = generate_custom_captcha(captcha_code, bg_color='#fdfbf7', text_color='#374151')
+    if image_format is not None:
+        from PIL import features
+
+        if image_format == "webp" and not features.check("webp"):
+            image_format = "png"
+        image_data = png_data if image_format == "png" else encode_captcha_image(img, image_format)
+        return Response(
+            image_data,
+            mimetype=CAPTCHA_IMAGE_FORMATS[image_format],
+            headers={"Cache-Control": "no-store", "X-Captcha-Expires-In": "300"},
+        )
 
     return jsonify(
         {
-            "captcha_image": base64.b64encode(image_data).decode("utf-8"),
+            "captcha_image": base64.b64encode(png_data).decode("utf-8"),
             "expires_in": 300,
         }
     )
@@ -490,6 +965,7 @@ def initialize_application():
             backup_path = (
                 DB_PATH + f".corrupted.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             )
+            reset_pool()
             try:
                 shutil.move(DB_PATH, backup_path)
                 print(f"[INFO] Backed up corrupted database to {backup_path}")
@@ -513,6 +989,7 @@ def initialize_application():
         if os.path.exists(PRELOADED_DB_PATH):
             try:
                 print(f"[INFO] Found preloaded data at {PRELOADED_DB_PATH}, copying...")
+                reset_pool()
                 shutil.copy2(PRELOADED_DB_PATH, DB_PATH)
                 # 确保复制后的文件权限正确
                 os.chmod(DB_PATH, 0o666)
@@ -530,6 +1007,9 @@ def initialize_application():
     # 5. 确保 admin 用户存在 (无论数据库是复制的还是新建的)
     create_admin_user()
 
+    # 6. 启动邮件发送线程，继续发送上次退出时队列中未发送的邮件
+    email_sender.ensure_started()
+
 
 def create_admin_user():
     """启动时检查并创建 admin 用户"""
@@ -556,12 +1036,111 @@ with app.app_context():
 # --- 核心修改结束 ---
 
 
+# === 预压缩静态文件 ===
+
+# index.html 的 Cache-Control；默认 no-cache 让浏览器每次用 ETag 校验，内容未变时只返回 304
+INDEX_CACHE_CONTROL = os.environ.get("INDEX_CACHE_CONTROL", "no-cache")
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+
+def _parse_accept_encoding(header):
+    """解析 Accept-Encoding，返回 {编码: q 值}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+class PrecompressedFile:
+    """在内存中保存文件的原始、gzip 和 brotli（已安装 brotli 时）版本及基于内容哈希的 ETag
+
+    每次请求检查文件的 mtime 和大小，文件变化时重新生成。
+    """
+
+    def __init__(self, path, mimetype):
+        self.path = path
+        self.mimetype = mimetype
+        self._lock = threading.Lock()
+        self._signature = None
+        self._digest = None
+        self._variants = {}
+
+    def _refresh(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            with open(self.path, "rb") as f:
+                data = f.read()
+            variants = {"identity": data, "gzip": gzip.compress(data, STATIC_GZIP_LEVEL, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(data, quality=STATIC_BROTLI_QUALITY)
+            self._digest = hashlib.sha256(data).hexdigest()[:32]
+            self._variants = variants
+            self._signature = signature
+
+    def _choose_encoding(self, accept_encoding):
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self._variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return "identity"
+
+    def _etag(self, encoding):
+        # 不同编码的表示使用不同的强 ETag，都以内容哈希开头
+        return f'"{self._digest}"' if encoding == "identity" else f'"{self._digest}-{encoding}"'
+
+    def _not_modified(self, if_none_match):
+        for tag in (if_none_match or "").split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-")[0] == self._digest:
+                return True
+        return False
+
+    def response(self):
+        self._refresh()
+        encoding = self._choose_encoding(request.headers.get("Accept-Encoding"))
+        headers = {
+            "ETag": self._etag(encoding),
+            "Cache-Control": INDEX_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(request.headers.get("If-None-Match")):
+            return Response(status=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self._variants[encoding], mimetype=self.mimetype, headers=headers)
+
+
+index_file = PrecompressedFile(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html"), "text/html"
+)
+
+
 # Scheme A: Root path serves frontend index.html
 @app.route("/", methods=["GET"])
 def index():
-    index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html")
-    if os.path.exists(index_path):
-        return send_from_directory(os.path.dirname(index_path), "index.html")
+    if os.path.exists(index_file.path):
+        return index_file.response()
     return jsonify({"error": "index.html not found"}), 404
 
 
@@ -777,7 +1356,7 @@ def resend_verification():
         send_verification_email(user["email"], verification_code, user["username"])
         return jsonify({"success": True, "message": "验证邮件已发送"})
     except Exception as e:
-        print(f"[ERROR] Failed to send verification email: {e}")
+        print(f"[ERROR] Failed to queue verification email: {e}")
         return jsonify({"error": "发送邮件失败"}), 500
 
 
@@ -830,7 +1409,7 @@ def change_email():
             send_verification_email(new_email, verification_code, current_user["username"], "change_email")
             return jsonify({"success": True, "message": "验证邮件已发送到新邮箱", "need_code": True})
         except Exception as e:
-            print(f"[ERROR] Failed to send verification email: {e}")
+            print(f"[ERROR] Failed to queue verification email: {e}")
             return jsonify({"error": "发送邮件失败"}), 500
 
 
@@ -863,8 +1442,7 @@ def change_password():
     from werkzeug.security import generate_password_hash
 
     hashed = generate_password_hash(new_password)
-    # 确保这里连接的是正确的 DB_PATH
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_conn()
     conn.execute("UPDATE users SET password = ? WHERE id = ?", (hashed, user_id))
     conn.commit()
     conn.close()
@@ -918,6 +1496,19 @@ def change_username():
     return jsonify({"ok": True, "username": new_username})
 
 
+# 分页列表每页默认/最大条数
+PAGE_SIZE_DEFAULT = 20
+PAGE_SIZE_MAX = 100
+
+
+def _parse_page_args():
+    """解析分页参数 limit / cursor，返回 (limit, cursor)；limit 不合法时抛出 ValueError"""
+    limit = int(request.args.get("limit", PAGE_SIZE_DEFAULT))
+    if limit < 1:
+        raise ValueError("invalid limit")
+    return min(limit, PAGE_SIZE_MAX), request.args.get("cursor") or None
+
+
 # Favorites CRUD (SQLite-backed)
 @app.route("/api/favorites", methods=["GET", "POST", "DELETE"])
 def favorites():
@@ -925,6 +1516,14 @@ def favorites():
         if "user_id" not in session:
             return jsonify({"error": "unauthorized"}), 401
         user_id = session["user_id"]
+        # 带 limit 或 cursor 参数时返回不含正文的分页列表
+        if "limit" in request.args or "cursor" in request.args:
+            try:
+                limit, cursor = _parse_page_args()
+                page = get_favorites_page(user_id, limit, cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify(page)
         items = get_favorites(user_id)
         return jsonify(items)
 
@@ -950,16 +1549,50 @@ def favorites():
     return jsonify({"error": "method not allowed"}), 405
 
 
+@app.route("/api/favorites/<int:fav_id>", methods=["GET"])
+def get_favorite_detail(fav_id):
+    """获取单条收藏的完整内容"""
+    if "user_id" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+    favorite = get_favorite_by_id(session["user_id"], fav_id)
+    if not favorite:
+        return jsonify({"error": "收藏不存在"}), 404
+    return jsonify(favorite)
+
+
 # 上传文章相关API
 @app.route("/api/uploaded", methods=["GET"])
 def get_uploaded():
-    """获取所有上传的文章"""
+    """获取上传的文章
+
+    带 limit 或 cursor 参数时返回当前用户文章的分页列表（不含正文，只有摘要），
+    否则保持旧行为返回全部文章。
+    """
     if "user_id" not in session:
         return jsonify({"error": "unauthorized"}), 401
+    if "limit" in request.args or "cursor" in request.args:
+        try:
+            limit, cursor = _parse_page_args()
+            page = get_uploaded_articles_page(session["user_id"], limit, cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(page)
     articles = get_uploaded_articles()
     return jsonify(articles)
 
 
+@app.route("/api/uploaded/<int:article_id>", methods=["GET"])
+def get_uploaded_detail(article_id):
+    """获取单篇上传文章的完整内容"""
+    if "user_id" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+    article = get_uploaded_article_by_id(article_id)
+    # 没有归属用户的文章来自旧版本数据库，所有登录用户都可以查看
+    if not article or article.get("user_id") not in (None, session["user_id"]):
+        return jsonify({"error": "文章不存在"}), 404
+    return jsonify(article)
+
+
 @app.route("/api/uploaded", methods=["POST"])
 def save_uploaded():
     """保存上传的文章"""
@@ -984,23 +1617,284 @@ def save_uploaded():
     if not title or not content:
         return jsonify({"error": "title和content是必填项"}), 400
 
-    # 重复校验：检查数据库中是否已存在相同标题和内容的文章
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id FROM uploaded_articles WHERE title = ? AND content = ?",
-        (title, content),
-    )
-    existing = cur.fetchone()
-    conn.close()
-
-    if existing:
-        return jsonify({"id": existing[0], "message": "文章已存在，跳过上传"}), 200
+    # 重复校验：按 (user_id, content_hash) 唯一索引去重，当前用户已有相同标题和内容的文章时跳过
+    article_id, created = insert_uploaded_article(title, author, content, file_name, file_size, user_id)
+    if not created:
+        return jsonify({"id": article_id, "message": "文章已存在，跳过上传"}), 200
 
-    article_id = save_uploaded_article(title, author, content, file_name, file_size, user_id)
     return jsonify({"id": article_id})
 
 
+# 批量上传单次请求允许的最大文章数；流式模式下每批提交的文章数
+UPLOAD_BATCH_MAX_ITEMS = int(os.environ.get("UPLOAD_BATCH_MAX_ITEMS", "5000"))
+UPLOAD_BATCH_STREAM_CHUNK = 100
+
+
+def _prepare_batch_article(data):
+    """校验并清理批量上传中的单篇文章，返回 (article, error)"""
+    if not isinstance(data, dict):
+        return None, "invalid item"
+    title = data.get("title")
+    content = data.get("content")
+    if not title or not content:
+        return None, "title和content是必填项"
+    if not isinstance(title, str) or not isinstance(content, str):
+        return None, "title和content必须是字符串"
+    content = strip_header_lines(content)
+    if not content:
+        return None, "title和content是必填项"
+    author = data.get("author")
+    if author is None:
+        author = "佚名"
+    file_name = data.get("fileName") or ""
+    file_size = data.get("fileSize", 0)
+    if not isinstance(author, str) or not isinstance(file_name, str):
+        return None, "author和fileName必须是字符串"
+    if isinstance(file_size, bool) or not isinstance(file_size, int):
+        file_size = 0
+    return {
+        "title": title,
+        "author": author,
+        "content": content,
+        "file_name": file_name,
+        "file_size": file_size,
+    }, None
+
+
+@app.route("/api/uploaded/batch", methods=["POST"])
+def save_uploaded_batch():
+    """批量保存上传的文章（用于上传文件夹）
+
+    请求体: {"articles": [{title, author, content, fileName, fileSize}, ...]}
+    默认在单个事务中写入并返回每篇文章的结果；
+    带 ?stream=1 时按 NDJSON 逐篇返回进度，每 UPLOAD_BATCH_STREAM_CHUNK 篇提交一次。
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+    user_id = session["user_id"]
+    data = request.json or {}
+    articles = data.get("articles")
+
+    if not isinstance(articles, list) or not articles:
+        return jsonify({"error": "articles required"}), 400
+    if len(articles) > UPLOAD_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"单次最多上传 {UPLOAD_BATCH_MAX_ITEMS} 篇文章"}), 400
+
+    prepared = [_prepare_batch_article(item) for item in articles]
+    stream = request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+    def _save(indexes):
+        """保存 indexes 对应的文章，返回逐篇结果"""
+        valid = [i for i in indexes if prepared[i][0] is not None]
+        saved = dict(zip(valid, insert_uploaded_articles_batch([prepared[i][0] for i in valid], user_id))) if valid else {}
+        results = []
+        for i in indexes:
+            if i in saved:
+                article_id, created = saved[i]
+                results.append({"index": i, "id": article_id, "status": "created" if created else "skipped"})
+            else:
+                results.append({"index": i, "id": None, "status": "invalid", "error": prepared[i][1]})
+        return results
+
+    def _summary(results):
+        summary = {"total": len(prepared), "created": 0, "skipped": 0, "invalid": 0}
+        for item in results:
+            summary[item["status"]] += 1
+        return summary
+
+    if not stream:
+        results = _save(list(range(len(prepared))))
+        return jsonify({"results": results, **_summary(results)})
+
+    def generate():
+        all_results = []
+        for start in range(0, len(prepared), UPLOAD_BATCH_STREAM_CHUNK):
+            results = _save(list(range(start, min(start + UPLOAD_BATCH_STREAM_CHUNK, len(prepared)))))
+            all_results.extend(results)
+            for item in results:
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, **_summary(all_results)}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# 压缩包导入：整个压缩包大小上限、单篇文章大小上限、每批写入的文章数和字节数
+# （两者任一达到即写入，待写入文章占用的内存不超过约 ARCHIVE_INSERT_BATCH_BYTES + 一篇文章）
+ARCHIVE_MAX_BYTES = int(os.environ.get("ARCHIVE_MAX_BYTES", str(512 * 1024 * 1024)))
+ARCHIVE_MAX_ENTRY_BYTES = int(os.environ.get("ARCHIVE_MAX_ENTRY_BYTES", str(5 * 1024 * 1024)))
+ARCHIVE_INSERT_BATCH = 100
+ARCHIVE_INSERT_BATCH_BYTES = 8 * 1024 * 1024
+ARCHIVE_TEXT_EXTENSIONS = (".txt", ".md", ".text", ".log", ".article", ".htm", ".html", ".utf8", ".ansi")
+
+
+def decode_text_bytes(data: bytes) -> str:
+    """检测文本编码并解码（BOM、UTF-8、GB18030，最后尝试 charset_normalizer）"""
+    if data.startswith(b"\xef\xbb\xbf"):
+        return data[3:].decode("utf-8", errors="replace")
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return data.decode("utf-16", errors="replace")
+    for encoding in ("utf-8", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(data).best()
+        if best is not None:
+            return str(best)
+    except ImportError:
+        pass
+    return data.decode("utf-8", errors="replace")
+
+
+def parse_text_article(file_name: str, text: str):
+    """解析文本文件为文章（与前端上传文件夹的解析规则一致），返回 dict 或 None"""
+    base_name = os.path.basename(file_name)
+    lines = text.split("\n")
+    title = re.sub(r"\.(txt|md|text|log|htm|html|article)$", "", base_name, flags=re.IGNORECASE)
+    author = "未知作者"
+    article_content = text
+
+    # 第一行较短时作为标题，去掉 "标题:" 之类的前缀
+    if lines and lines[0].strip():
+        first_line_raw = lines[0].strip()
+        if len(first_line_raw) < 100 and not first_line_raw.startswith("<"):
+            first_line = re.sub(r"^(标题|Title|题名)[:：]\s*", "", first_line_raw, flags=re.IGNORECASE)
+            if first_line:
+                title = first_line
+    if len(lines) > 1:
+        author_line = lines[1].strip()
+        if author_line.startswith(("作者：", "作者:", "Author:", "author:", "【作者】", "作者 】")):
+            author = re.sub(r"作者：|作者:|Author:|author:|【作者】|作者 】", "", author_line, count=1).strip()
+            article_content = "\n".join(lines[2:])
+
+    if base_name.lower().endswith((".html", ".htm")):
+        content = article_content
+    else:
+        # 纯文本转换为 HTML 段落
+        content = "".join(
+            f"<p>{html.escape(paragraph, quote=False)}</p>"
+            for paragraph in article_content.split("\n\n")
+            if paragraph.strip()
+        )
+
+    content = strip_header_lines(content)
+    if not title or not content:
+        return None
+    return {"title": title, "author": author, "content": content}
+
+
+def _iter_archive_entries(fileobj):
+    """逐个解压压缩包中的文本文件，yield (file_name, data)
+
+    data 为 None 表示文件过大或无法读取（加密、不支持的压缩方式、数据损坏）。
+    """
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                name = info.filename
+                if not info.flag_bits & 0x800:
+                    # 未标记 UTF-8 的中文文件名通常是 GBK 编码
+                    try:
+                        name = name.encode("cp437").decode("gbk")
+                    except (UnicodeEncodeError, UnicodeDecodeError):
+                        pass
+                try:
+                    data = _read_limited(zf.open(info), info.file_size)
+                except (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error, EOFError):
+                    # 加密条目抛出 RuntimeError，不支持的压缩方式抛出 NotImplementedError
+                    data = None
+                yield name, data
+        return
+
+    fileobj.seek(0)
+    # 流式模式逐个读取条目，不需要把整个压缩包解压到内存
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            try:
+                data = _read_limited(tf.extractfile(member), member.size)
+            except (tarfile.TarError, zlib.error, EOFError):
+                data = None
+            yield member.name, data
+
+
+def _read_limited(stream, declared_size):
+    if declared_size > ARCHIVE_MAX_ENTRY_BYTES:
+        return None
+    with stream:
+        # 不信任声明的大小，最多多读 1 字节用于判断是否超限
+        data = stream.read(ARCHIVE_MAX_ENTRY_BYTES + 1)
+    return None if len(data) > ARCHIVE_MAX_ENTRY_BYTES else data
+
+
+@app.route("/api/uploaded/archive", methods=["POST"])
+def upload_archive():
+    """上传 .zip / .tar / .tar.gz 压缩包并在服务端导入其中的文本文章
+
+    支持 multipart 表单字段 file，或直接以请求体发送压缩包。
+    压缩包先写入临时文件，再逐个条目解压、解析并分批写入数据库，内存占用与压缩包大小无关。
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+    user_id = session["user_id"]
+    request.max_content_length = ARCHIVE_MAX_BYTES
+
+    summary = {"total": 0, "created": 0, "skipped": 0, "invalid": 0, "ignored": 0}
+    pending = []
+    pending_bytes = 0
+
+    def _flush():
+        nonlocal pending_bytes
+        for _, created in insert_uploaded_articles_batch(pending, user_id):
+            summary["created" if created else "skipped"] += 1
+        pending.clear()
+        pending_bytes = 0
+
+    with tempfile.TemporaryFile() as spool:
+        upload = request.files.get("file")
+        if upload is not None:
+            upload.save(spool)
+        else:
+            shutil.copyfileobj(request.stream, spool, 64 * 1024)
+        if spool.tell() == 0:
+            return jsonify({"error": "压缩包为空"}), 400
+
+        try:
+            for name, data in _iter_archive_entries(spool):
+                base_name = os.path.basename(name)
+                if base_name.startswith(".") or not base_name.lower().endswith(ARCHIVE_TEXT_EXTENSIONS):
+                    summary["ignored"] += 1
+                    continue
+                summary["total"] += 1
+                if not data:
+                    summary["invalid"] += 1
+                    continue
+                article = parse_text_article(base_name, decode_text_bytes(data))
+                if article is None:
+                    summary["invalid"] += 1
+                    continue
+                article["file_name"] = base_name
+                article["file_size"] = len(data)
+                pending.append(article)
+                pending_bytes += len(data)
+                if len(pending) >= ARCHIVE_INSERT_BATCH or pending_bytes >= ARCHIVE_INSERT_BATCH_BYTES:
+                    _flush()
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            if pending:
+                _flush()
+            return jsonify({"error": f"无法解析压缩包: {e}", **summary}), 400
+        if pending:
+            _flush()
+
+    return jsonify(summary)
+
+
 @app.route("/api/uploaded/<int:article_id>", methods=["DELETE"])
 def delete_uploaded(article_id):
     """删除上传的文章"""
@@ -1075,18 +1969,13 @@ def download_favorites_zip():
     memory_file = io.BytesIO()
     with zipfile.ZipFile(memory_file, "w", zipfile.ZIP_DEFLATED) as zf:
         for idx, article in enumerate(articles):
-            title = article.get("title", f"文章{idx + 1}")
-            author = article.get("author", "")
-            content = article.get("content", "")
-
-            # 清理文件名中的非法字符
-            safe_title = "".join(c for c in title if c.isalnum() or c in " _-()")
-            if not safe_title:
-                safe_title = f"article_{idx + 1}"
-
-            file_name = f"{safe_title}.txt"
-            file_content = f"标题: {title}\n作者: {author}\n\n{content}"
-            zf.writestr(file_name, file_content)
+            _write_favorite_zip_entry(
+                zf,
+                idx,
+                article.get("title", f"文章{idx + 1}"),
+                article.get("author", ""),
+                article.get("content", ""),
+            )
 
     memory_file.seek(0)
 
@@ -1098,6 +1987,73 @@ def download_favorites_zip():
     )
 
 
+def _write_favorite_zip_entry(zf, idx, title, author, content, used_names=None):
+    """把一篇收藏写入 zip（文件名去除非法字符，重名时追加序号）"""
+    title = title or f"文章{idx + 1}"
+    # 清理文件名中的非法字符
+    safe_title = "".join(c for c in title if c.isalnum() or c in " _-()")
+    if not safe_title:
+        safe_title = f"article_{idx + 1}"
+
+    file_name = f"{safe_title}.txt"
+    if used_names is not None:
+        n = 1
+        while file_name in used_names:
+            n += 1
+            file_name = f"{safe_title}_{n}.txt"
+        used_names.add(file_name)
+    file_content = f"标题: {title}\n作者: {author or ''}\n\n{content or ''}"
+    zf.writestr(file_name, file_content)
+
+
+# 导出 zip 时先写入内存，超过该大小后转存到临时文件
+EXPORT_SPOOL_MAX_BYTES = 1024 * 1024
+
+
+@app.route("/api/favorites/export", methods=["POST"])
+def export_favorites_zip():
+    """按收藏 id 导出 zip（服务端直接从数据库读取内容）
+
+    请求体: {"ids": [1, 2, 3]} 或 {"ids": "all"}
+    内容逐行从数据库读取并写入临时文件，内存占用与导出数量无关。
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+    user_id = session["user_id"]
+
+    data = request.json or {}
+    ids = data.get("ids")
+    if ids == "all":
+        fav_ids = None
+    elif isinstance(ids, list) and ids:
+        try:
+            fav_ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return jsonify({"error": "ids must be a list of integers or \"all\""}), 400
+    else:
+        return jsonify({"error": "ids required"}), 400
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    used_names = set()
+    count = 0
+    with zipfile.ZipFile(spool, "w", zipfile.ZIP_DEFLATED) as zf:
+        for row in iter_favorites_for_export(user_id, fav_ids):
+            _write_favorite_zip_entry(zf, count, row["title"], row["author"], row["content"], used_names)
+            count += 1
+
+    if count == 0:
+        spool.close()
+        return jsonify({"error": "没有可导出的收藏"}), 404
+
+    spool.seek(0)
+    return send_file(
+        spool,
+        mimetype="application/zip",
+        as_attachment=True,
+        download_name="收藏文章.zip",
+    )
+
+
 # === 文章源管理 API ===
 
 @app.route("/api/sources", methods=["GET"])
@@ -1106,6 +2062,10 @@ def get_sources():
     enabled_only = request.args.get("enabled", "false").lower() == "true"
     sources = get_article_sources(enabled_only)
     global_algorithm = get_global_polling_algorithm()
+    # 管理员可以看到每个源的健康状态
+    if is_admin_session():
+        for source in sources:
+            source["health"] = source_health.snapshot(source)
     return jsonify({
         "sources": sources,
         "globalAlgorithm": global_algorithm
@@ -1124,23 +2084,28 @@ def add_source():
     if not name or not url:
         return jsonify({"error": "name和url是必填项"}), 400
     
-    if polling_algorithm not in ("sequential", "random"):
+    if polling_algorithm not in POLLING_ALGORITHMS:
         polling_algorithm = "sequential"
     
     # 验证API是否可访问
     if url:
         try:
-            resp = requests.get(url, timeout=10, verify=False)
+            resp = upstream_http.get(url, stream=True)
             if not resp.ok:
+                resp.close()
                 return jsonify({"error": f"API地址不可访问: {resp.status_code}"}), 400
             
-            if api_validation:
+            if not api_validation:
+                resp.close()
+            else:
                 try:
-                    data_resp = resp.json()
+                    data_resp, _ = read_json_limited(resp, SOURCE_MAX_RESPONSE_BYTES)
                     keys = [k.strip() for k in api_validation.split(",")]
                     for key in keys:
                         if key not in data_resp:
                             return jsonify({"error": f"API验证失败: 缺少字段 {key}"}), 400
+                except ResponseTooLarge:
+                    return jsonify({"error": f"API验证失败: 返回内容超过 {SOURCE_MAX_RESPONSE_BYTES} 字节"}), 400
                 except:
                     return jsonify({"error": "API验证失败: 返回的不是有效的JSON"}), 400
         except requests.exceptions.Timeout:
@@ -1161,14 +2126,46 @@ def update_source(source_id):
     api_validation = data.get("api_validation")
     polling_algorithm = data.get("polling_algorithm")
     enabled = data.get("enabled")
+    prefetch_size = data.get("prefetch_size")
+    prefetch_interval = data.get("prefetch_interval")
+    max_response_bytes = data.get("max_response_bytes")
     
-    if polling_algorithm and polling_algorithm not in ("sequential", "random"):
-        return jsonify({"error": "polling_algorithm必须是sequential或random"}), 400
+    if polling_algorithm and polling_algorithm not in POLLING_ALGORITHMS:
+        return jsonify({"error": "polling_algorithm必须是" + "、".join(POLLING_ALGORITHMS) + "之一"}), 400
     
     if enabled is not None and not isinstance(enabled, bool):
         enabled = bool(enabled)
-    
-    success = update_article_source(source_id, name, url, api_validation, polling_algorithm, enabled)
+
+    # 预取和响应大小设置会影响对上游的请求量，只允许管理员修改
+    tuning = (prefetch_size, prefetch_interval, max_response_bytes)
+    if any(value is not None for value in tuning) and not is_admin_session():
+        return jsonify({"error": "forbidden"}), 403
+
+    try:
+        if prefetch_size is not None:
+            prefetch_size = int(prefetch_size)
+            if prefetch_size < 0:
+                raise ValueError
+            prefetch_size = min(prefetch_size, SOURCE_PREFETCH_MAX_SIZE)
+        if prefetch_interval is not None:
+            prefetch_interval = float(prefetch_interval)
+            if prefetch_interval < 0:
+                raise ValueError
+            prefetch_interval = max(prefetch_interval, SOURCE_PREFETCH_MIN_INTERVAL)
+    except (TypeError, ValueError):
+        return jsonify({"error": "prefetch_size和prefetch_interval必须是非负数"}), 400
+    try:
+        if max_response_bytes is not None:
+            max_response_bytes = int(max_response_bytes)
+            if max_response_bytes <= 0:
+                raise ValueError
+            max_response_bytes = min(max_response_bytes, SOURCE_MAX_RESPONSE_BYTES_LIMIT)
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_response_bytes必须是正整数"}), 400
+    
+    success = update_article_source(source_id, name, url, api_validation, polling_algorithm, enabled,
+                                    prefetch_size=prefetch_size, prefetch_interval=prefetch_interval,
+                                    max_response_bytes=max_response_bytes)
     if not success:
         return jsonify({"error": "文章源不存在"}), 404
     
@@ -1196,43 +2193,521 @@ def set_algorithm():
     data = request.json or {}
     algorithm = data.get("algorithm", "sequential")
     
-    if algorithm not in ("sequential", "random"):
-        return jsonify({"error": "algorithm必须是sequential或random"}), 400
+    if algorithm not in POLLING_ALGORITHMS:
+        return jsonify({"error": "algorithm必须是" + "、".join(POLLING_ALGORITHMS) + "之一"}), 400
     
     set_global_polling_algorithm(algorithm)
     return jsonify({"message": "轮询算法已更新", "algorithm": algorithm})
 
 
+# === 上游 HTTP 连接池 ===
+
+# 连接池配置：缓存的主机连接池数量、每个主机保持的连接数、失败重试次数与退避系数
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "10"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "1"))
+HTTP_RETRY_BACKOFF = float(os.environ.get("HTTP_RETRY_BACKOFF", "0.2"))
+HTTP_TIMEOUT = 10
+# 文章源响应体的默认大小上限（字节），可以按源通过 max_response_bytes 调整
+SOURCE_MAX_RESPONSE_BYTES = int(os.environ.get("SOURCE_MAX_RESPONSE_BYTES", str(2 * 1024 * 1024)))
+# 按源设置的 max_response_bytes 不能超过的上限（全局默认值更大时以默认值为准）
+SOURCE_MAX_RESPONSE_BYTES_LIMIT = max(16 * 1024 * 1024, SOURCE_MAX_RESPONSE_BYTES)
+UPSTREAM_READ_CHUNK_SIZE = 64 * 1024
+
+
+class ResponseTooLarge(Exception):
+    """上游响应体超过大小上限"""
+
+
+def read_json_limited(resp, max_bytes):
+    """流式读取（stream=True 的）响应并增量解码后解析 JSON，返回 (data, 读取的字节数)
+
+    累计读取超过 max_bytes 时立即中止连接并抛出 ResponseTooLarge，不会把整个响应体读入内存。
+    """
+    try:
+        length = resp.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > max_bytes:
+            raise ResponseTooLarge(int(length))
+
+        decoder = None
+        parts = []
+        received = 0
+        for chunk in resp.iter_content(UPSTREAM_READ_CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ResponseTooLarge(received)
+            if decoder is None:
+                # 响应头声明了 charset 时使用它，否则按 JSON 规范从开头几个字节判断 UTF 编码
+                if "charset" in resp.headers.get("Content-Type", "").lower():
+                    encoding = resp.encoding
+                else:
+                    encoding = requests.utils.guess_json_utf(chunk) or "utf-8"
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            parts.append(decoder.decode(chunk))
+        if decoder is not None:
+            parts.append(decoder.decode(b"", final=True))
+        return json.loads("".join(parts)), received
+    finally:
+        resp.close()
+
+
+class UpstreamHTTP(ProcessLocal):
+    """文章源请求共享的 keep-alive requests.Session
+
+    所有线程共用同一个 Session（urllib3 连接池本身是线程安全的），
+    避免每次请求都重新进行 DNS 解析、TCP 握手和 TLS 握手。
+    """
+
+    def _reset_state(self):
+        self._session = self._build_session()
+
+    @property
+    def session(self):
+        self._ensure_process()
+        return self._session
+
+    @staticmethod
+    def _build_session():
+        from http.cookiejar import DefaultCookiePolicy
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # 读取超时不重试（read=False 直接抛出原始的超时异常）：卡住的源重试只会让等待时间翻倍，
+        # 并且重试耗尽后的 MaxRetryError 会被 requests 转成 ConnectionError，丢失“超时”这一分类
+        retry = Retry(
+            total=HTTP_MAX_RETRIES,
+            connect=HTTP_MAX_RETRIES,
+            read=False,
+            status=HTTP_MAX_RETRIES,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        # 多线程共享的 Session 不保存上游返回的 cookie
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", HTTP_TIMEOUT)
+        kwargs.setdefault("verify", False)
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """每个主机的请求数与新建连接数（请求数 - 新建连接数 即复用次数）"""
+        hosts = {}
+        session = self.session
+        for adapter in {id(a): a for a in session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{key.key_scheme}://{key.key_host}:{key.key_port}"
+                hosts[host] = {
+                    "requests": pool.num_requests,
+                    "connections": pool.num_connections,
+                }
+        total_requests = sum(h["requests"] for h in hosts.values())
+        total_connections = sum(h["connections"] for h in hosts.values())
+        return {
+            "hosts": hosts,
+            "requests": total_requests,
+            "connections": total_connections,
+            "reused": max(0, total_requests - total_connections),
+        }
+
+
+upstream_http = UpstreamHTTP()
+
+
+# === 文章源健康状态 ===
+
+# 连续失败多少次后熔断、熔断后多久允许半开探测（秒，连续探测失败时翻倍，最多 SOURCE_BREAKER_MAX_COOLDOWN）
+SOURCE_BREAKER_THRESHOLD = int(os.environ.get("SOURCE_BREAKER_THRESHOLD", "3"))
+SOURCE_BREAKER_COOLDOWN = float(os.environ.get("SOURCE_BREAKER_COOLDOWN", "30"))
+SOURCE_BREAKER_MAX_COOLDOWN = float(os.environ.get("SOURCE_BREAKER_MAX_COOLDOWN", "600"))
+# 自适应超时：p95 延迟 * 倍数，限制在 [SOURCE_TIMEOUT_MIN, HTTP_TIMEOUT] 之间
+SOURCE_TIMEOUT_MIN = float(os.environ.get("SOURCE_TIMEOUT_MIN", "2"))
+SOURCE_TIMEOUT_MULTIPLIER = float(os.environ.get("SOURCE_TIMEOUT_MULTIPLIER", "3"))
+# EWMA 平滑系数、计算延迟分位数保留的样本数、开始使用自适应超时所需的最少样本数
+SOURCE_EWMA_ALPHA = 0.2
+SOURCE_LATENCY_SAMPLES = 50
+SOURCE_MIN_SAMPLES = 5
+# 半开探测名额的最长占用时间（秒）：超过一次请求可能耗费的最长时间后视为已释放，
+# 避免申请了名额却没有发出请求（或请求异常退出）时该源永远无法再被探测
+SOURCE_PROBE_LEASE = HTTP_TIMEOUT * (HTTP_MAX_RETRIES + 1)
+
+
+class SourceHealth:
+    """记录每个文章源的健康状态：EWMA 延迟、错误率、最近成功时间和熔断器状态
+
+    熔断器状态：closed（正常）→ 连续失败达到阈值后 open（跳过该源）→
+    冷却时间过后 half_open（只放行一个探测请求）→ 探测成功回到 closed，失败则重新 open。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _state(self, source_id):
+        state = self._states.get(source_id)
+        if state is None:
+            state = {
+                "breaker": "closed",
+                "ewma_latency": None,
+                "error_rate": 0.0,
+                "latencies": deque(maxlen=SOURCE_LATENCY_SAMPLES),
+                "consecutive_failures": 0,
+                "cooldown": SOURCE_BREAKER_COOLDOWN,
+                "opened_at": 0.0,
+                "probe_in_flight": False,
+                "probe_started": 0.0,
+                "last_success": None,
+                "last_failure": None,
+                "last_error": None,
+                "requests": 0,
+                "failures": 0,
+                "oversize": 0,
+                "responses": 0,
+                "not_modified": 0,
+                "bytes_received": 0,
+            }
+            self._states[source_id] = state
+        return state
+
+    def allow(self, source):
+        """熔断器是否允许请求该源；半开状态下同一时间只放行一个探测请求
+
+        返回 True 后调用方必须发出请求并 record() 结果，不发请求时应调用 release() 归还探测名额。
+        """
+        source_id = source.get("id")
+        if source_id is None:
+            return True
+        with self._lock:
+            state = self._state(source_id)
+            if state["breaker"] == "closed":
+                return True
+            now = time.monotonic()
+            if state["breaker"] == "open":
+                if now - state["opened_at"] < state["cooldown"]:
+                    return False
+                state["breaker"] = "half_open"
+            if state["probe_in_flight"] and now - state["probe_started"] < SOURCE_PROBE_LEASE:
+                return False
+            state["probe_in_flight"] = True
+            state["probe_started"] = now
+            return True
+
+    def release(self, source):
+        """归还 allow() 放行但最终没有发出的探测名额"""
+        with self._lock:
+            state = self._states.get(source.get("id"))
+            if state and state["breaker"] == "half_open":
+                state["probe_in_flight"] = False
+
+    def record(self, source, latency, error_type=None):
+        source_id = source.get("id")
+        if source_id is None:
+            return
+        with self._lock:
+            state = self._state(source_id)
+            state["requests"] += 1
+            failed = 1.0 if error_type else 0.0
+            state["error_rate"] += SOURCE_EWMA_ALPHA * (failed - state["error_rate"])
+            was_probe = state["probe_in_flight"]
+            state["probe_in_flight"] = False
+            if not error_type:
+                state["latencies"].append(latency)
+                if state["ewma_latency"] is None:
+                    state["ewma_latency"] = latency
+                else:
+                    state["ewma_latency"] += SOURCE_EWMA_ALPHA * (latency - state["ewma_latency"])
+                state["last_success"] = datetime.now().isoformat(timespec="seconds")
+                state["consecutive_failures"] = 0
+                state["breaker"] = "closed"
+                state["cooldown"] = SOURCE_BREAKER_COOLDOWN
+                return
+
+            state["failures"] += 1
+            if error_type == "oversize":
+                state["oversize"] += 1
+            state["consecutive_failures"] += 1
+            state["last_failure"] = datetime.now().isoformat(timespec="seconds")
+            state["last_error"] = error_type
+            if state["breaker"] == "half_open" and was_probe:
+                # 探测失败：重新熔断并延长冷却时间
+                state["cooldown"] = min(state["cooldown"] * 2, SOURCE_BREAKER_MAX_COOLDOWN)
+                state["breaker"] = "open"
+                state["opened_at"] = time.monotonic()
+            elif state["breaker"] == "closed" and state["consecutive_failures"] >= SOURCE_BREAKER_THRESHOLD:
+                state["breaker"] = "open"
+                state["opened_at"] = time.monotonic()
+
+    def record_transfer(self, source, bytes_received, not_modified=False):
+        """记录一次上游响应的响应体字节数，not_modified 表示 304 响应"""
+        source_id = source.get("id")
+        if source_id is None:
+            return
+        with self._lock:
+            state = self._state(source_id)
+            state["responses"] += 1
+            state["bytes_received"] += bytes_received
+            if not_modified:
+                state["not_modified"] += 1
+
+    def routing_stats(self, source):
+        """返回 (EWMA 延迟秒数或 None, 错误率, 请求次数)，供轮询算法使用"""
+        with self._lock:
+            state = self._states.get(source.get("id"))
+            if not state:
+                return None, 0.0, 0
+            return state["ewma_latency"], state["error_rate"], state["requests"]
+
+    @staticmethod
+    def _percentile(samples, pct):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def timeout_for(self, source):
+        """根据观测到的 p95 延迟计算该源的请求超时"""
+        source_id = source.get("id")
+        with self._lock:
+            state = self._states.get(source_id)
+            if not state or len(state["latencies"]) < SOURCE_MIN_SAMPLES:
+                return HTTP_TIMEOUT
+            p95 = self._percentile(state["latencies"], 0.95)
+        return min(HTTP_TIMEOUT, max(SOURCE_TIMEOUT_MIN, p95 * SOURCE_TIMEOUT_MULTIPLIER))
+
+    def summary(self):
+        """按熔断器状态统计已记录的源数量（只读内存，不请求上游）"""
+        counts = {"closed": 0, "open": 0, "half_open": 0}
+        now = time.monotonic()
+        with self._lock:
+            for state in self._states.values():
+                breaker = state["breaker"]
+                if breaker == "open" and now - state["opened_at"] >= state["cooldown"]:
+                    breaker = "half_open"
+                counts[breaker] += 1
+        return counts
+
+    def snapshot(self, source):
+        """供管理员查看的健康状态"""
+        source_id = source.get("id")
+        with self._lock:
+            state = self._states.get(source_id)
+            if not state:
+                return {"state": "closed", "requests": 0}
+            latencies = list(state["latencies"])
+            breaker = state["breaker"]
+            if breaker == "open" and time.monotonic() - state["opened_at"] >= state["cooldown"]:
+                breaker = "half_open"
+            snapshot = {
+                "state": breaker,
+                "ewma_latency_ms": round(state["ewma_latency"] * 1000, 1) if state["ewma_latency"] is not None else None,
+                "p95_latency_ms": round(self._percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+                "error_rate": round(state["error_rate"], 3),
+                "consecutive_failures": state["consecutive_failures"],
+                "last_success": state["last_success"],
+                "last_failure": state["last_failure"],
+                "last_error": state["last_error"],
+                "requests": state["requests"],
+                "failures": state["failures"],
+                "oversize": state["oversize"],
+                "bytes_received": state["bytes_received"],
+                "not_modified": state["not_modified"],
+                "not_modified_rate": round(state["not_modified"] / state["responses"], 3) if state["responses"] else None,
+            }
+        snapshot["timeout"] = round(self.timeout_for(source), 2)
+        return snapshot
+
+
+source_health = SourceHealth()
+
+
 # === 轮询获取文章 ===
 
-def fetch_article_from_source(source):
+class SingleFlight:
+    """合并同一个 key 的并发调用：同一时间只有一个调用真正执行，其余调用等待并共享它的结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """执行 fn()，如果同一个 key 已有调用在进行中则等待其结果
+
+        返回 (result, shared)；等待超过 timeout 秒时抛出 concurrent.futures.TimeoutError。
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                self.executed += 1
+                leader = True
+        if not leader:
+            return future.result(timeout), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+upstream_single_flight = SingleFlight()
+
+
+def fetch_article_from_source(source, timeout=None, coalesce=True):
     """从指定文章源获取文章，返回 (article_data, error_type)
-    error_type: None (成功), 'timeout' (超时), 'connection' (连接错误), 'invalid' (数据无效)
+    error_type: None (成功), 'timeout' (超时), 'connection' (连接错误), 'invalid' (数据无效),
+                'oversize' (响应体超过该源的大小上限)
+
+    未指定 timeout 时使用根据该源历史延迟计算的自适应超时，并记录本次请求的健康状态。
+    coalesce=True 时同一个源的并发请求合并为一次上游请求，共享同一篇文章。
     """
+    if timeout is None:
+        timeout = source_health.timeout_for(source)
+    if not coalesce:
+        return _fetch_and_record(source, timeout)
+    key = source.get("id") or source.get("url")
+    try:
+        (article, error_type), shared = upstream_single_flight.do(
+            key, lambda: _fetch_and_record(source, timeout), timeout
+        )
+    except FuturesTimeoutError:
+        return None, "timeout"
+    # 共享结果时返回副本，避免多个请求修改同一个 dict
+    return (dict(article) if shared and article else article), error_type
+
+
+def _fetch_and_record(source, timeout):
+    started = time.monotonic()
+    article, error_type = _fetch_article(source, timeout)
+    source_health.record(source, time.monotonic() - started, None if article else (error_type or "invalid"))
+    if article and source.get("id") is not None:
+        try:
+            archive_fetched_article(source["id"], article)
+        except Exception as e:
+            print(f"[WARNING] Failed to archive article from {source.get('url')}: {e}")
+    return article, error_type
+
+
+class SourceValidators:
+    """记录每个源最近一次响应的 ETag / Last-Modified 和对应的文章，用于条件请求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def headers_for(self, source):
+        """返回条件请求头；源地址变化后不再使用旧的校验值"""
+        with self._lock:
+            entry = self._entries.get(source.get("id"))
+            if not entry or entry["url"] != source.get("url"):
+                return {}
+            headers = {}
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+
+    def cached_article(self, source):
+        with self._lock:
+            entry = self._entries.get(source.get("id"))
+            if not entry or entry["url"] != source.get("url"):
+                return None
+            return dict(entry["article"])
+
+    def store(self, source, resp, article):
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        with self._lock:
+            if not etag and not last_modified:
+                self._entries.pop(source.get("id"), None)
+                return
+            self._entries[source.get("id")] = {
+                "url": source.get("url"),
+                "etag": etag,
+                "last_modified": last_modified,
+                "article": dict(article),
+            }
+
+
+source_validators = SourceValidators()
+
+
+def _fetch_article(source, timeout):
     url = source.get("url")
     if not url:
         return None, "invalid"
     
+    max_bytes = min(source.get("max_response_bytes") or SOURCE_MAX_RESPONSE_BYTES, SOURCE_MAX_RESPONSE_BYTES_LIMIT)
     try:
-        resp = requests.get(url, timeout=10, verify=False)
+        resp = upstream_http.get(url, timeout=timeout, stream=True, headers=source_validators.headers_for(source))
+        if resp.status_code == 304:
+            resp.close()
+            article = source_validators.cached_article(source)
+            source_health.record_transfer(source, 0, not_modified=True)
+            # 校验值在请求期间被其他请求清除时没有可复用的文章，按失败处理
+            return (article, None) if article else (None, "invalid")
         if not resp.ok:
+            resp.close()
             return None, "invalid"
         
-        data = resp.json()
+        data, received = read_json_limited(resp, max_bytes)
+        source_health.record_transfer(source, received)
         if isinstance(data, dict):
+            title = data.get("title") or data.get("c_title") or data.get("tt") or "无标题"
+            content = data.get("content") or data.get("c_content") or data.get("text") or data.get("dc") or "<p>暂无内容</p>"
             article = {
-                "id": data.get("id") or data.get("date") or str(int.from_bytes(os.urandom(2), "little")),
-                "title": data.get("title") or data.get("c_title") or data.get("tt") or "无标题",
+                # 上游没有提供 id 时使用内容哈希，同一篇文章多次获取得到相同的 id
+                "id": data.get("id") or data.get("date") or compute_content_hash(title, content)[:16],
+                "title": title,
                 "author": data.get("author") or data.get("c_author") or "未知",
-                "content": data.get("content") or data.get("c_content") or data.get("text") or data.get("dc") or "<p>暂无内容</p>",
+                "content": content,
                 "source": source.get("name")
             }
+            source_validators.store(source, resp, article)
             return article, None
         return None, "invalid"
+    except ResponseTooLarge as e:
+        print(f"[WARNING] Response from {url} exceeds {max_bytes} bytes ({e.args[0]}), aborted")
+        return None, "oversize"
     except requests.exceptions.Timeout:
         print(f"[WARNING] Timeout fetching from {url}")
         return None, "timeout"
-    except requests.exceptions.RequestException:
+    except requests.exceptions.RequestException as e:
+        # 流式读取响应体时的超时会被 requests 包装成 ConnectionError
+        if _is_read_timeout(e):
+            print(f"[WARNING] Timeout fetching from {url}")
+            return None, "timeout"
         print(f"[WARNING] Connection error fetching from {url}")
         return None, "connection"
     except Exception as e:
@@ -1240,21 +2715,539 @@ def fetch_article_from_source(source):
         return None, "invalid"
 
 
-def get_next_source_index(sources, current_index, algorithm):
-    """根据轮询算法获取下一个源索引"""
-    if not sources:
-        return -1
-    
+def _is_read_timeout(exc):
+    """判断 requests 异常的底层原因是否为读取超时"""
+    from urllib3.exceptions import ReadTimeoutError
+
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (ReadTimeoutError, TimeoutError)):
+            return True
+        reason = getattr(exc, "reason", None)
+        nested = exc.args[0] if exc.args and isinstance(exc.args[0], BaseException) else None
+        exc = reason if isinstance(reason, BaseException) else nested or exc.__context__
+    return False
+
+
+# 计算源权重/得分时延迟的下限（秒），避免极小延迟导致权重失衡
+SOURCE_SCORE_MIN_LATENCY = 0.01
+# 成功率的下限，避免错误率为 1 时除以 0
+SOURCE_SCORE_MIN_SUCCESS = 0.05
+
+
+def _source_latency(latency, requests):
+    """计算代价/权重使用的延迟：从未请求过的源返回 None（优先探测）；
+    请求过但从未成功（没有延迟样本）的源按 HTTP_TIMEOUT 计算，使其排在健康的源之后"""
+    if latency is not None:
+        return max(latency, SOURCE_SCORE_MIN_LATENCY)
+    return None if requests == 0 else HTTP_TIMEOUT
+
+
+def _source_cost(source):
+    """源的预期代价：EWMA 延迟 / 成功率，越小越好；从未请求过的源返回 0 以便优先探测"""
+    latency, error_rate, requests = source_health.routing_stats(source)
+    latency = _source_latency(latency, requests)
+    if latency is None:
+        return 0.0
+    return latency / max(1.0 - error_rate, SOURCE_SCORE_MIN_SUCCESS)
+
+
+def _source_weight(source):
+    """加权轮询使用的权重，与预期代价成反比"""
+    latency, error_rate, requests = source_health.routing_stats(source)
+    success = max(1.0 - error_rate, SOURCE_SCORE_MIN_SUCCESS)
+    latency = _source_latency(latency, requests)
+    if latency is None:
+        return success
+    return success / latency
+
+
+_wrr_lock = threading.Lock()
+# 平滑加权轮询的当前权重，按源 id 保存
+_wrr_current = {}
+
+
+def _weighted_round_robin_pick(sources, candidates):
+    """平滑加权轮询（与 nginx 相同的算法）：从 candidates 中选出一个源索引"""
+    weights = {index: _source_weight(sources[index]) for index in candidates}
+    total = sum(weights.values())
+    with _wrr_lock:
+        best = None
+        for index in candidates:
+            source_id = sources[index].get("id")
+            current = _wrr_current.get(source_id, 0.0) + weights[index]
+            _wrr_current[source_id] = current
+            if best is None or current > _wrr_current[sources[best].get("id")]:
+                best = index
+        _wrr_current[sources[best].get("id")] -= total
+    return best
+
+
+def get_source_order(sources, current_index, algorithm):
+    """根据轮询算法给出本次请求尝试各源的顺序（不重复的源索引列表）
+
+    - sequential: 从上次使用的源的下一个开始依次轮询
+    - random: 随机排列
+    - weighted_round_robin: 按延迟和成功率计算权重做平滑加权轮询
+    - least_latency: 按预期代价（EWMA 延迟 / 成功率）从小到大
+    - power_of_two: 每次随机取两个源，选预期代价较小的一个
+    """
+    count = len(sources)
+    if not count:
+        return []
+
     if algorithm == "random":
-        import random
-        return random.randint(0, len(sources) - 1)
-    else:
-        return (current_index + 1) % len(sources)
+        return random.sample(range(count), count)
+
+    if algorithm == "least_latency":
+        costs = [_source_cost(source) for source in sources]
+        return sorted(range(count), key=lambda index: costs[index])
+
+    if algorithm == "power_of_two":
+        costs = [_source_cost(source) for source in sources]
+        remaining = list(range(count))
+        order = []
+        while remaining:
+            if len(remaining) == 1:
+                choice = remaining[0]
+            else:
+                a, b = random.sample(remaining, 2)
+                choice = a if costs[a] <= costs[b] else b
+            order.append(choice)
+            remaining.remove(choice)
+        return order
+
+    if algorithm == "weighted_round_robin":
+        first = _weighted_round_robin_pick(sources, range(count))
+        rest = sorted((index for index in range(count) if index != first),
+                      key=lambda index: _source_weight(sources[index]), reverse=True)
+        return [first] + rest
+
+    start = (current_index + 1) % count
+    return [(start + offset) % count for offset in range(count)]
 
 
 _current_source_index = {"index": -1}
 
 
+# === 每日一文预取缓冲 ===
+
+# 每个源默认缓冲的文章数（0 表示关闭预取）、两次补充之间的最小间隔（秒）、缓冲文章的最长保留时间（秒）
+PREFETCH_BUFFER_SIZE = int(os.environ.get("PREFETCH_BUFFER_SIZE", "2"))
+PREFETCH_REFILL_INTERVAL = float(os.environ.get("PREFETCH_REFILL_INTERVAL", "5"))
+PREFETCH_MAX_AGE = float(os.environ.get("PREFETCH_MAX_AGE", "3600"))
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "4"))
+# 按源设置的 prefetch_size 上限和 prefetch_interval 下限（秒），防止预取持续请求上游
+SOURCE_PREFETCH_MAX_SIZE = 20
+SOURCE_PREFETCH_MIN_INTERVAL = 1.0
+# 后台线程检查启用源列表的周期（秒）
+PREFETCH_POLL_INTERVAL = 1.0
+
+
+class ArticlePrefetcher(ProcessLocal):
+    """为每个启用的文章源在后台维护一个有界的预取文章缓冲
+
+    daily() 先从缓冲中取文章，缓冲为空时才实时请求上游。
+    缓冲大小和补充间隔可以通过 article_sources 的 prefetch_size / prefetch_interval 按源配置。
+    """
+
+    thread_name = "prefetcher"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def _reset_state(self):
+        # 线程池的工作线程在第一次 submit 时才创建
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        self._wake = threading.Event()
+        # source_id -> {"url", "items": deque[(fetched_at, article)], "last_fetch", "in_flight", "hits", "misses", ...}
+        self._buffers = {}
+
+    @staticmethod
+    def buffer_size(source):
+        size = source.get("prefetch_size")
+        return PREFETCH_BUFFER_SIZE if size is None else min(max(0, int(size)), SOURCE_PREFETCH_MAX_SIZE)
+
+    @staticmethod
+    def refill_interval(source):
+        interval = source.get("prefetch_interval")
+        return PREFETCH_REFILL_INTERVAL if interval is None else max(SOURCE_PREFETCH_MIN_INTERVAL, float(interval))
+
+    def _buffer_for(self, source):
+        """获取（必要时创建）源的缓冲；源地址变化时丢弃旧文章。调用方需持有锁"""
+        buf = self._buffers.get(source["id"])
+        if buf is None or buf["url"] != source.get("url"):
+            buf = {
+                "url": source.get("url"),
+                "items": deque(),
+                "last_fetch": 0.0,
+                "in_flight": False,
+                "hits": 0,
+                "misses": 0,
+                "fetched": 0,
+                "errors": 0,
+            }
+            self._buffers[source["id"]] = buf
+        return buf
+
+    def pop(self, source):
+        """从源的缓冲中取出一篇文章，缓冲为空时返回 None"""
+        if self.buffer_size(source) <= 0:
+            return None
+        self._ensure_started()
+        now = time.monotonic()
+        with self._lock:
+            buf = self._buffer_for(source)
+            article = None
+            while buf["items"]:
+                fetched_at, item = buf["items"].popleft()
+                if now - fetched_at <= PREFETCH_MAX_AGE:
+                    article = item
+                    break
+            if article is not None:
+                buf["hits"] += 1
+            else:
+                buf["misses"] += 1
+        # 取走文章后唤醒后台线程尽快补充
+        self._wake.set()
+        return article
+
+    def offer(self, source, article):
+        """把额外获取到的文章（如对冲请求中未被使用的结果）放入缓冲，缓冲已满时丢弃"""
+        if not article or self.buffer_size(source) <= 0:
+            return
+        with self._lock:
+            buf = self._buffer_for(source)
+            if len(buf["items"]) < self.buffer_size(source):
+                buf["items"].append((time.monotonic(), article))
+
+    def _run(self):
+        while True:
+            self._wake.wait(PREFETCH_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self._refill()
+            except Exception as e:
+                print(f"[WARNING] Prefetch refill failed: {e}")
+
+    def _refill(self):
+        sources = get_article_sources(enabled_only=True)
+        now = time.monotonic()
+        to_fetch = []
+        with self._lock:
+            active_ids = set()
+            for source in sources:
+                size = self.buffer_size(source)
+                if size <= 0:
+                    continue
+                active_ids.add(source["id"])
+                buf = self._buffer_for(source)
+                # 丢弃过期文章
+                while buf["items"] and now - buf["items"][0][0] > PREFETCH_MAX_AGE:
+                    buf["items"].popleft()
+                if buf["in_flight"] or len(buf["items"]) >= size:
+                    continue
+                if now - buf["last_fetch"] < self.refill_interval(source):
+                    continue
+                if not source_health.allow(source):
+                    continue
+                buf["in_flight"] = True
+                buf["last_fetch"] = now
+                to_fetch.append(source)
+            # 已禁用或删除的源不再保留缓冲
+            for source_id in list(self._buffers):
+                if source_id not in active_ids:
+                    del self._buffers[source_id]
+
+        for source in to_fetch:
+            self._executor.submit(self._fetch_into_buffer, source)
+
+    def _fetch_into_buffer(self, source):
+        article, error_type = None, "invalid"
+        try:
+            # 预取的文章会放进缓冲供之后的请求使用，不与实时请求合并，避免同一篇文章被返回两次
+            article, error_type = fetch_article_from_source(source, coalesce=False)
+        finally:
+            with self._lock:
+                buf = self._buffers.get(source["id"])
+                if buf is not None and buf["url"] == source.get("url"):
+                    buf["in_flight"] = False
+                    if article:
+                        buf["items"].append((time.monotonic(), article))
+                        buf["fetched"] += 1
+                    else:
+                        buf["errors"] += 1
+        if article:
+            # 缓冲可能还没满，继续补充
+            self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                str(source_id): {
+                    "buffered": len(buf["items"]),
+                    "hits": buf["hits"],
+                    "misses": buf["misses"],
+                    "fetched": buf["fetched"],
+                    "errors": buf["errors"],
+                }
+                for source_id, buf in self._buffers.items()
+            }
+
+
+prefetcher = ArticlePrefetcher()
+
+
+# === 对冲请求（hedged）模式 ===
+
+# sequential: 依次尝试每个源；hedged: 当前源在 DAILY_HEDGE_DELAY 秒内未返回（或失败）时并发请求下一个源，
+# 返回第一个有效结果，整个请求受 DAILY_DEADLINE 秒的总时限约束
+DAILY_FETCH_MODE = os.environ.get("DAILY_FETCH_MODE", "sequential").lower()
+DAILY_HEDGE_DELAY = float(os.environ.get("DAILY_HEDGE_DELAY", "1.5"))
+DAILY_DEADLINE = float(os.environ.get("DAILY_DEADLINE", "10"))
+DAILY_HEDGE_WORKERS = int(os.environ.get("DAILY_HEDGE_WORKERS", "8"))
+
+class HedgeExecutor(ProcessLocal):
+    """对冲请求共用的线程池"""
+
+    def _reset_state(self):
+        self._executor = ThreadPoolExecutor(max_workers=DAILY_HEDGE_WORKERS, thread_name_prefix="hedge")
+
+    def get(self):
+        self._ensure_process()
+        return self._executor
+
+
+hedge_executor = HedgeExecutor()
+
+
+def fetch_article_hedged(sources, order):
+    """按 order 顺序对多个源发起对冲请求，返回 (article, source_index, error_types)
+
+    先请求第一个源；每过 DAILY_HEDGE_DELAY 秒仍无结果、或某个请求失败时，立即并发请求下一个源。
+    熔断中的源会被跳过并记为 circuit_open。
+    第一个有效结果直接返回，其余仍在进行的请求结果会放入预取缓冲（缓冲已满时丢弃）。
+    """
+    executor = hedge_executor.get()
+    deadline = time.monotonic() + DAILY_DEADLINE
+    pending = {}
+    error_types = []
+    next_pos = 0
+    last_launch = 0.0
+
+    def _launch():
+        """启动 order 中下一个熔断器允许的源，跳过熔断中的源"""
+        nonlocal next_pos, last_launch
+        while next_pos < len(order):
+            index = order[next_pos]
+            next_pos += 1
+            source = sources[index]
+            # 真正发出请求前才申请熔断器许可，避免半开状态的探测名额被没有发出的请求占用
+            if not source_health.allow(source):
+                error_types.append("circuit_open")
+                continue
+            last_launch = time.monotonic()
+            remaining = max(0.1, deadline - last_launch)
+            timeout = min(source_health.timeout_for(source), remaining)
+            try:
+                future = executor.submit(fetch_article_from_source, source, timeout)
+            except Exception:
+                source_health.release(source)
+                raise
+            pending[future] = index
+            return
+
+    def _offer_late(future, source):
+        if not future.cancelled() and future.exception() is None:
+            prefetcher.offer(source, future.result()[0])
+
+    _launch()
+    try:
+        while pending:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                error_types.append("timeout")
+                break
+            wait_for = remaining
+            if next_pos < len(order):
+                wait_for = min(remaining, max(0.0, last_launch + DAILY_HEDGE_DELAY - now))
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            failed = False
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    article, error_type = future.result()
+                except Exception as e:
+                    print(f"[WARNING] Hedged fetch failed: {e}")
+                    article, error_type = None, "invalid"
+                if article:
+                    return article, index, error_types
+                failed = True
+                if error_type:
+                    error_types.append(error_type)
+
+            # 请求失败、对冲延迟已到、或没有进行中的请求时，启动下一个源
+            if next_pos < len(order) and (
+                failed or not pending or time.monotonic() - last_launch >= DAILY_HEDGE_DELAY
+            ):
+                _launch()
+    finally:
+        for future, index in pending.items():
+            future.add_done_callback(lambda f, source=sources[index]: _offer_late(f, source))
+
+    return None, -1, error_types
+
+
+# === 每日共享文章 ===
+
+# 开启后每天（按 DAILY_TIMEZONE 计算日期）第一次成功获取的文章会被固定下来，当天所有用户看到同一篇
+DAILY_SHARED_ARTICLE = os.environ.get("DAILY_SHARED_ARTICLE", "false").lower() in ("1", "true", "yes")
+DAILY_TIMEZONE = os.environ.get("DAILY_TIMEZONE", "Asia/Shanghai")
+# 内存中的固定文章多久与数据库核对一次（秒），使管理员刷新在多进程下也能生效
+DAILY_PIN_RECHECK_INTERVAL = 60
+
+
+def _load_timezone(name):
+    """解析时区名（如 Asia/Shanghai）或 UTC 偏移（如 +08:00），无法解析时使用 UTC"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        pass
+    match = re.fullmatch(r"(?:UTC)?([+-])(\d{1,2})(?::?(\d{2}))?", name.strip())
+    if match:
+        sign = 1 if match.group(1) == "+" else -1
+        offset = timedelta(hours=int(match.group(2)), minutes=int(match.group(3) or 0))
+        return dt_timezone(sign * offset)
+    print(f"[WARNING] Unknown DAILY_TIMEZONE {name!r}, using UTC")
+    return dt_timezone.utc
+
+
+class DailyArticlePin:
+    """每天固定一篇共享文章：内存缓存 + daily_articles 表持久化
+
+    当天还没有固定文章时，只有一个请求去上游获取，其他并发请求等待并直接使用它的结果
+    （无论成功还是失败），不会在它失败后依次重新获取。
+    """
+
+    def __init__(self, tz_name):
+        self.tz = _load_timezone(tz_name)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._day = None
+        self._article = None
+        self._checked_at = 0.0
+
+    def today(self):
+        return datetime.now(self.tz).date().isoformat()
+
+    def get(self):
+        """返回今天固定的文章，没有时返回 None"""
+        day = self.today()
+        now = time.monotonic()
+        if self._day == day and now - self._checked_at < DAILY_PIN_RECHECK_INTERVAL:
+            return self._article
+        article = get_daily_article(day)
+        self._day, self._article, self._checked_at = day, article, now
+        return article
+
+    def _pin(self, day, article, replace=False):
+        pinned = pin_daily_article(day, article, replace=replace)
+        self._day, self._article, self._checked_at = day, pinned, time.monotonic()
+        return pinned
+
+    def get_or_fetch(self, sources):
+        """返回 (article, error_types)：优先使用今天固定的文章，没有时获取一篇并固定"""
+        article = self.get()
+        if article:
+            return article, []
+        day = self.today()
+        (article, error_types), shared = self._flight.do(day, lambda: self._fetch_and_pin(day, sources))
+        if shared:
+            return (dict(article) if article else None), list(error_types)
+        return article, error_types
+
+    def _fetch_and_pin(self, day, sources):
+        # 上一次获取刚结束时其他请求可能已经固定了文章
+        article = self.get()
+        if article:
+            return article, []
+        article, error_types = _fetch_daily_article(sources, use_prefetch=False)
+        if article:
+            article = self._pin(day, article)
+        return article, error_types
+
+    def refresh(self, sources):
+        """强制重新获取并替换今天固定的文章"""
+        with self._lock:
+            day = self.today()
+            article, error_types = _fetch_daily_article(sources, use_prefetch=False)
+            if article:
+                article = self._pin(day, article, replace=True)
+            return article, error_types
+
+    def stats(self):
+        return {
+            "enabled": DAILY_SHARED_ARTICLE,
+            "timezone": DAILY_TIMEZONE,
+            "day": self.today(),
+            "pinned": bool(self._day == self.today() and self._article),
+            "fetches": self._flight.executed,
+            "coalesced": self._flight.coalesced,
+        }
+
+
+daily_pin = DailyArticlePin(DAILY_TIMEZONE)
+
+
+def _fetch_daily_article(sources, use_prefetch=True):
+    """按轮询算法从启用的源获取一篇文章，返回 (article, error_types)
+
+    use_prefetch=False 时不使用（也不会启动）预取缓冲，每日共享文章模式下每天只需请求一次上游。
+    """
+    global_algorithm = get_global_polling_algorithm()
+    error_types = []  # 记录所有错误类型
+    # 本次请求尝试各源的顺序，失败转移时不会重复选到同一个源
+    order = get_source_order(sources, _current_source_index["index"], global_algorithm)
+
+    if DAILY_FETCH_MODE == "hedged":
+        # 优先使用已预取的文章
+        for index in order:
+            article = prefetcher.pop(sources[index]) if use_prefetch else None
+            if article:
+                _current_source_index["index"] = index
+                return article, error_types
+        _current_source_index["index"] = order[-1]
+        # 熔断中的源在 fetch_article_hedged 内部跳过
+        article, index, hedge_errors = fetch_article_hedged(sources, order)
+        error_types.extend(hedge_errors)
+        if article:
+            _current_source_index["index"] = index
+            return article, error_types
+    else:
+        for next_index in order:
+            _current_source_index["index"] = next_index
+        
+            source = sources[next_index]
+            article = prefetcher.pop(source) if use_prefetch else None
+            if article:
+                return article, error_types
+            # 跳过熔断中的源
+            if not source_health.allow(source):
+                error_types.append("circuit_open")
+                continue
+            article, error_type = fetch_article_from_source(source)
+            if article:
+                return article, error_types
+            if error_type:
+                error_types.append(error_type)
+
+    return None, error_types
+
+
 # 替换原有的 /api/daily 接口
 # 删除旧的 daily 函数定义，从下面开始
 
@@ -1273,23 +3266,27 @@ def daily():
             }
         ), 503
     
-    global_algorithm = get_global_polling_algorithm()
-    
-    article_data = None
-    error_types = []  # 记录所有错误类型
-    
-    for i in range(len(sources)):
-        next_index = get_next_source_index(sources, _current_source_index["index"], global_algorithm)
-        _current_source_index["index"] = next_index
-        
-        source = sources[next_index]
-        article, error_type = fetch_article_from_source(source)
-        if article:
-            return jsonify(article)
-        if error_type:
-            error_types.append(error_type)
-    
-    # 所有源都失败，根据错误类型返回不同的提示
+    if DAILY_SHARED_ARTICLE:
+        article, error_types = daily_pin.get_or_fetch(sources)
+    else:
+        article, error_types = _fetch_daily_article(sources)
+    if article:
+        return jsonify(article)
+
+    # 所有源都失败：先用存档中的文章兜底（stale），上游恢复后预取和后续请求会重新获取新文章
+    archived = get_archived_article([source["id"] for source in sources])
+    if archived:
+        return jsonify({
+            "id": archived["upstream_id"] or archived["content_hash"][:16],
+            "title": archived["title"],
+            "author": archived["author"],
+            "content": archived["content"],
+            "source": archived["source_name"],
+            "stale": True,
+            "fetched_at": datetime.fromtimestamp(archived["fetched_at"]).isoformat(timespec="seconds"),
+        })
+
+    # 存档中也没有可用文章，根据错误类型返回不同的提示
     if "timeout" in error_types:
         return jsonify(
             {
@@ -1304,6 +3301,13 @@ def daily():
                 "message": "无法连接到文章源，请检查源地址是否正确。",
             }
         ), 503
+    elif set(error_types) == {"circuit_open"}:
+        return jsonify(
+            {
+                "error": "sources unavailable",
+                "message": "文章源近期连续失败，已暂停请求，请稍后重试。",
+            }
+        ), 503
     else:
         return jsonify(
             {
@@ -1318,6 +3322,37 @@ def daily():
 
 
 
+# === 健康检查 ===
+
+@app.route("/api/health", methods=["GET"])
+@limiter.exempt
+def health():
+    """存活检查：进程能处理请求即返回 200，不访问数据库和上游"""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/api/ready", methods=["GET"])
+@limiter.exempt
+def ready():
+    """就绪检查：数据库可用、DATA_DIR 可写；文章源健康状态只读内存缓存，仅供参考，不影响结果"""
+    checks = {}
+    try:
+        conn = get_conn()
+        conn.execute("SELECT 1").fetchone()
+        conn.close()
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+    checks["data_dir"] = "ok" if os.access(DATA_DIR, os.W_OK) else "not writable"
+
+    is_ready = all(value == "ok" for value in checks.values())
+    return jsonify({
+        "status": "ok" if is_ready else "unavailable",
+        "checks": checks,
+        "sources": source_health.summary(),
+    }), 200 if is_ready else 503
+
+
 # Version info API
 @app.route("/api/version", methods=["GET"])
 def get_version():
@@ -1413,6 +3448,42 @@ def admin_delete_user(user_id):
     return jsonify({"deleted": user_id})
 
 
+@app.route("/api/admin/stats", methods=["GET"])
+@admin_required
+def admin_stats():
+    """运行时统计信息（连接池、写队列等）"""
+    return jsonify({
+        "db_pool": get_pool_stats(),
+        "db_writer": get_writer_stats(),
+        "system_config": get_config_cache_stats(),
+        "prefetch": prefetcher.stats(),
+        "upstream_http": upstream_http.stats(),
+        "single_flight": upstream_single_flight.stats(),
+        "compression": compression_stats.stats(),
+        "captcha_pool": captcha_pool.stats(),
+        "email": email_sender.stats(),
+        "fetched_articles": get_fetched_article_stats(),
+        "daily_pin": daily_pin.stats(),
+        "sources": {
+            source["id"]: source_health.snapshot(source)
+            for source in get_article_sources(enabled_only=False)
+        },
+    })
+
+
+@app.route("/api/admin/daily/refresh", methods=["POST"])
+@admin_required
+def admin_refresh_daily():
+    """强制重新获取今天的共享文章"""
+    sources = get_article_sources(enabled_only=True)
+    if not sources:
+        return jsonify({"error": "no sources enabled"}), 503
+    article, error_types = daily_pin.refresh(sources)
+    if not article:
+        return jsonify({"error": "failed to fetch daily", "errors": error_types}), 503
+    return jsonify(article)
+
+
 @app.route("/api/admin/smtp", methods=["GET"])
 def admin_get_smtp():
     if "user_id" not in session:
@@ -1470,10 +3541,6 @@ def admin_test_smtp():
     if not row or row["role"] != "admin":
         return jsonify({"error": "forbidden"}), 403
     
-    import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    
     data = request.get_json() or {}
     test_email = data.get("email", "").strip()
     
@@ -1491,13 +3558,27 @@ def admin_test_smtp():
         greeting = "您好，这是来自 ReadZen 的测试邮件。"
         content = "如果您收到这封邮件，说明 SMTP 配置正确，您可以正常使用邮件功能了。"
         html_body = get_email_template(title, greeting, content)
-        send_html_email(test_email, subject, html_body)
+        job_id = queue_html_email(test_email, subject, html_body)
         
-        return jsonify({"success": True, "message": f"测试邮件已发送至 {test_email}"})
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "message": f"测试邮件已加入发送队列，收件人 {test_email}",
+        })
     except Exception as e:
         return jsonify({"error": f"发送失败: {str(e)}"}), 500
 
 
+@app.route("/api/admin/email/jobs/<int:job_id>", methods=["GET"])
+@admin_required
+def admin_get_email_job(job_id):
+    """查询邮件发送任务的状态（如 SMTP 测试邮件是否发送成功）"""
+    job = get_email_job(job_id)
+    if not job:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(job)
+
+
 @app.route("/api/admin/reset-password/<int:user_id>", methods=["POST"])
 def admin_reset_user_password(user_id):
     if "user_id" not in session:
@@ -1571,11 +3652,11 @@ def forgot_password():
         greeting = "您好，我们收到了您的密码重置请求。"
         content = "请使用上面的验证码重置您的密码。如果这不是您本人操作，请立即更改您的账户密码。"
         html_body = get_email_template(title, greeting, content, code, "重置验证码", expiry_hours=10)
-        send_html_email(email, subject, html_body)
+        queue_html_email(email, subject, html_body)
         
         return jsonify({"success": True, "message": "验证码已发送至您的邮箱"})
     except Exception as e:
-        print(f"[ERROR] Failed to send reset email: {e}")
+        print(f"[ERROR] Failed to queue reset email: {e}")
         return jsonify({"error": "发送邮件失败，请稍后重试"}), 500
 
 